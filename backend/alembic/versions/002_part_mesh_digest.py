@@ -0,0 +1,26 @@
+"""Add content digest of imported meshes to parts
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('parts', sa.Column('mesh_digest', sa.String(64), nullable=True))
+    op.create_index('ix_parts_mesh_digest', 'parts', ['mesh_digest'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_parts_mesh_digest')
+    op.drop_column('parts', 'mesh_digest')
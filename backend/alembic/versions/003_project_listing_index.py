@@ -0,0 +1,28 @@
+"""Add index matching the project listing order
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_project_section_pos_updated',
+        'projects',
+        ['section_id', 'position', sa.text('updated_at DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_project_section_pos_updated')
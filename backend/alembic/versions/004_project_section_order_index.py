@@ -0,0 +1,27 @@
+"""Add index matching the section project ordering
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_project_section_pos_created',
+        'projects',
+        ['section_id', 'position', 'created_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_project_section_pos_created')
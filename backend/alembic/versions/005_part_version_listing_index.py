@@ -0,0 +1,29 @@
+"""Add covering index for the part version listing
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_partversion_part_created',
+        'part_versions',
+        ['part_id', sa.text('created_at DESC')],
+        postgresql_include=['id', 'source', 'status'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_partversion_part_created')
@@ -0,0 +1,25 @@
+"""Add updated_at indexes keying the section listing cache
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_section_updated', 'sections', ['updated_at'])
+    op.create_index('ix_project_updated', 'projects', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_project_updated')
+    op.drop_index('ix_section_updated')
@@ -15,17 +15,36 @@ class Settings(BaseSettings):
             return v.replace("postgresql://", "postgresql+asyncpg://", 1)
         return v
     
+    # Connection pool (handlers are short reads; long writes must not hold a
+    # connection across external I/O such as LLM or CAD calls)
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 5.0  # seconds to wait for a free connection
+    db_pool_recycle: int = 300  # seconds before a connection is replaced
+    
     # LLM Providers
     openai_api_key: str = ""
     anthropic_api_key: str = ""
     default_llm_provider: Literal["openai", "anthropic"] = "openai"
+    agent_batch_concurrency: int = 8  # Concurrent pipelines in AgentService.generate_batch
+    agent_stage_timeout: float = 300.0  # Seconds per agent stage before it is abandoned
+    conversation_max_sessions: int = 512  # Design conversations kept in memory per process
+    conversation_session_ttl: float = 3600.0  # Seconds a conversation may sit idle before eviction
     
     # Server
     debug: bool = False
+    debug_raiseload: bool = False  # Raise on lazy relationship loads (catches N+1 in dev/CI)
     cors_origins: list[str] = ["http://localhost:5173", "http://localhost:3000"]
     
+    # CadQuery sandbox: warm worker processes (0 = fresh subprocess per call)
+    cad_worker_pool_size: int = 2
+    cad_worker_pool_max: int = 4  # Extra workers are started under load, up to this many
+    cad_worker_memory_mb: int = 4096  # Address-space cap per worker (0 = unlimited)
+    cad_result_cache_size: int = 1024  # Successful runs remembered by code digest
+    
     # File storage
     temp_dir: str = "/tmp/cad3d"
+    persist_stl: bool = True  # Write previews to temp_dir; False streams them from memory
     
     class Config:
         env_file = ".env"
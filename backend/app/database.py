@@ -1,11 +1,17 @@
+from asyncpg.exceptions import ForeignKeyViolationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, raiseload
 from app.config import settings
 
 
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
     pool_pre_ping=True,
 )
 
@@ -20,6 +26,24 @@ class Base(DeclarativeBase):
     pass
 
 
+def guarded_loads(*loaders):
+    """Return loader options, forbidding lazy loads when DEBUG_RAISELOAD is set.
+    
+    Each eager loader is chained with raiseload("*") so the relationships of
+    the objects it loads are guarded too.
+    """
+    if not settings.debug_raiseload:
+        return loaders
+    return (*(loader.raiseload("*") for loader in loaders), raiseload("*"))
+
+
+def is_fk_violation(error: IntegrityError, constraint: str) -> bool:
+    """Whether an IntegrityError was raised by the named foreign key constraint."""
+    # The asyncpg dialect wraps the driver's exception; the original is its cause
+    cause = error.orig.__cause__
+    return isinstance(cause, ForeignKeyViolationError) and cause.constraint_name == constraint
+
+
 async def get_db():
     async with async_session_maker() as session:
         try:
@@ -2,10 +2,13 @@ import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.config import settings
 from app.database import init_db
+from app.services.cad_service import cad_service
+from app.services.llm_service import llm_service
 from app.routers import projects, parts, generate, export, printers, sections, versions, imports, conversations
 
 
@@ -14,9 +17,13 @@ async def lifespan(app: FastAPI):
     # Startup
     os.makedirs(settings.temp_dir, exist_ok=True)
     await init_db()
+    # Boot the CadQuery workers now so the first request (and the health
+    # check) only succeed once they are warm
+    await cad_service.start()
     yield
     # Shutdown
-    pass
+    await cad_service.close()
+    await llm_service.close()
 
 
 app = FastAPI(
@@ -24,6 +31,7 @@ app = FastAPI(
     description="Web application for generating 3D printable models via natural language or CadQuery scripting",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -27,6 +27,7 @@ class Part(Base):
         UUID(as_uuid=True),
         ForeignKey("projects.id", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     code: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -39,6 +40,7 @@ class Part(Base):
         nullable=False,
     )
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    mesh_digest: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)  # Imported mesh file
     created_at: Mapped[datetime] = mapped_column(
         DateTime,
         default=datetime.utcnow,
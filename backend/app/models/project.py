@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey, Integer
+from sqlalchemy import String, Text, DateTime, ForeignKey, Integer, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -8,6 +8,14 @@ from app.database import Base
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # Matches list_projects: section filter, then position ASC, updated_at DESC
+        Index("ix_project_section_pos_updated", "section_id", "position", text("updated_at DESC")),
+        # Matches the Section.projects relationship ordering
+        Index("ix_project_section_pos_created", "section_id", "position", "created_at"),
+        # max(updated_at) keys the list_sections cache
+        Index("ix_project_updated", "updated_at"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
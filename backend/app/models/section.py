@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, Integer
+from sqlalchemy import String, DateTime, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -8,6 +8,10 @@ from app.database import Base
 
 class Section(Base):
     __tablename__ = "sections"
+    __table_args__ = (
+        # max(updated_at) keys the list_sections cache
+        Index("ix_section_updated", "updated_at"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -33,4 +37,5 @@ class Section(Base):
     projects: Mapped[list["Project"]] = relationship(
         "Project",
         back_populates="section",
+        order_by="(Project.position, Project.created_at)",
     )
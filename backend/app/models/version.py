@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from typing import Any
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy import String, Text, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 
@@ -11,6 +11,15 @@ from app.database import Base
 class PartVersion(Base):
     """Stores version history for parts - created on each save."""
     __tablename__ = "part_versions"
+    __table_args__ = (
+        # Covers list_part_versions: part filter, newest first, summary columns
+        Index(
+            "idx_partversion_part_created",
+            "part_id",
+            text("created_at DESC"),
+            postgresql_include=["id", "source", "status"],
+        ),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
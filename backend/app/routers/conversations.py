@@ -3,10 +3,17 @@ API routes for conversational design sessions.
 """
 import base64
 from typing import Literal
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database import get_db
+from app.models import Part
+from app.models.part import PartStatus
+from app.services.cad_service import cad_service
 from app.services.conversation_service import conversation_service, ConversationPhase
+from app.services.parameter_service import parameter_service
 from app.config import settings
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
@@ -343,15 +350,12 @@ async def delete_conversation(session_id: str):
 
 
 @router.post("/{session_id}/apply-to-part")
-async def apply_to_part(session_id: str, part_id: str):
+async def apply_to_part(
+    session_id: str,
+    part_id: str,
+    db: AsyncSession = Depends(get_db),
+):
     """Apply generated code to a part."""
-    from sqlalchemy import select
-    from app.database import async_session
-    from app.models import Part
-    from app.models.part import PartStatus
-    from app.services.cad_service import cad_service
-    from app.services.parameter_service import parameter_service
-    
     session = conversation_service.get_session(session_id)
     if not session:
         raise HTTPException(
@@ -365,48 +369,46 @@ async def apply_to_part(session_id: str, part_id: str):
             detail="No generated code in conversation",
         )
     
-    async with async_session() as db:
-        query = select(Part).where(Part.id == part_id)
-        result = await db.execute(query)
-        part = result.scalar_one_or_none()
+    query = select(Part).where(Part.id == part_id)
+    result = await db.execute(query)
+    part = result.scalar_one_or_none()
+    
+    if not part:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Part not found",
+        )
+    
+    try:
+        part.code = session.generated_code
+        part.prompt = session.requirements.description
         
-        if not part:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Part not found",
-            )
+        # Extract parameters
+        params = parameter_service.extract_parameters(session.generated_code)
+        part.parameters = params
         
-        try:
-            part.code = session.generated_code
-            part.prompt = session.requirements.description
-            
-            # Extract parameters
-            params = parameter_service.extract_parameters(session.generated_code)
-            part.parameters = params
-            
-            # Execute to validate
-            exec_result = await cad_service.execute_code(session.generated_code)
-            
-            if exec_result.success:
-                part.bounding_box = exec_result.bounding_box
-                part.status = PartStatus.GENERATED
-                part.error_message = None
-            else:
-                part.status = PartStatus.ERROR
-                part.error_message = exec_result.error
-            
-            await db.commit()
-            await db.refresh(part)
-            
-            return {
-                "status": "applied",
-                "part_id": str(part.id),
-                "part_status": part.status.value,
-            }
-            
-        except Exception as e:
-            await db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to apply code: {str(e)}",
-            )
+        # Execute to validate
+        exec_result = await cad_service.execute_code(session.generated_code)
+        
+        if exec_result.success:
+            part.bounding_box = exec_result.bounding_box
+            part.status = PartStatus.GENERATED
+            part.error_message = None
+        else:
+            part.status = PartStatus.ERROR
+            part.error_message = exec_result.error
+        
+        await db.commit()
+        
+        return {
+            "status": "applied",
+            "part_id": str(part.id),
+            "part_status": part.status.value,
+        }
+        
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to apply code: {str(e)}",
+        )
@@ -1,10 +1,12 @@
+from urllib.parse import quote
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.config import settings
 from app.database import get_db
 from app.models import Project, Part
 from app.services.cad_service import cad_service
@@ -13,6 +15,18 @@ from app.services.export_service import export_service
 router = APIRouter()
 
 
+def _attachment(filename: str) -> dict[str, str]:
+    """Content-Disposition header for a download, built as FileResponse does.
+    
+    Names that aren't plain ASCII (or contain quotes) use the RFC 5987
+    filename* form, since header values must be latin-1 encodable.
+    """
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
 @router.get("/parts/{part_id}/preview")
 async def get_part_preview(
     part_id: UUID,
@@ -36,6 +50,13 @@ async def get_part_preview(
         )
     
     try:
+        if not settings.persist_stl:
+            stl = await cad_service.generate_stl_bytes(part.code)
+            return Response(
+                content=stl,
+                media_type="model/stl",
+                headers=_attachment(f"{part.name}.stl"),
+            )
         stl_path = await cad_service.generate_stl(part.code, str(part_id))
         return FileResponse(
             stl_path,
@@ -1,6 +1,7 @@
 import json
 import re
 import base64
+import asyncio
 from uuid import UUID
 from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
@@ -11,15 +12,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Part, Project
 from app.models.part import PartStatus
-from app.schemas import PartResponse, PartGenerateRequest, ProjectResponse, ContextPart
+from app.schemas import PartResponse, PartGenerateRequest, ProjectResponse, ContextPart, BoundingBox
+from app.prompts.assembly_system import ASSEMBLY_SYSTEM_PROMPT
+from app.prompts.project_system import PROJECT_SYSTEM_PROMPT
 from app.services.llm_service import llm_service, OPENAI_MODELS, ANTHROPIC_MODELS, DEFAULT_OPENAI_MODEL, DEFAULT_ANTHROPIC_MODEL
 from app.services.cad_service import cad_service
 from app.services.parameter_service import parameter_service
 from app.services.agent_service import agent_service
+from app.services.llm_json import extract_json
 from app.config import settings
 
 router = APIRouter()
 
+# JSON embedded in LLM responses: the widest {...}
+_JSON_RE = re.compile(r'\{[\s\S]*\}')
+
 
 @router.get("/models")
 async def get_available_models():
@@ -36,6 +43,30 @@ async def get_available_models():
     }
 
 
+class BboxBatchRequest(BaseModel):
+    codes: list[str] = Field(..., min_length=1, max_length=64)
+
+
+class BboxBatchResult(BaseModel):
+    success: bool
+    bounding_box: BoundingBox | None = None
+    error: str | None = None
+
+
+class BboxBatchResponse(BaseModel):
+    results: list[BboxBatchResult]  # Same order as the request's codes
+
+
+@router.post("/bbox/batch", response_model=BboxBatchResponse)
+async def measure_codes(request: BboxBatchRequest):
+    """Execute several CadQuery codes (e.g. variants of a part) in one sandbox round-trip."""
+    results = await cad_service.execute_codes(request.codes)
+    return BboxBatchResponse(results=[
+        BboxBatchResult(success=r.success, bounding_box=r.bounding_box, error=r.error)
+        for r in results
+    ])
+
+
 # Assembly AI schemas
 class PartPositionInfo(BaseModel):
     id: str
@@ -84,6 +115,60 @@ class ProjectGenerateResponse(BaseModel):
     parts: list[GeneratedPartInfo]
 
 
+async def _build_generated_part(project_id: UUID, part_data: dict) -> tuple[Part, GeneratedPartInfo]:
+    """Create a part from generated data and execute its code to validate it."""
+    part_name = part_data.get("name", "Part")
+    part_code = part_data.get("code", "")
+    part_desc = part_data.get("description", "")
+    
+    part = Part(
+        project_id=project_id,
+        name=part_name,
+        code=part_code,
+        prompt=part_desc,
+    )
+    
+    try:
+        part.parameters = parameter_service.extract_parameters(part_code)
+        result = await cad_service.execute_code(part_code)
+        
+        if result.success:
+            part.bounding_box = result.bounding_box
+            part.status = PartStatus.GENERATED
+            part.error_message = None
+            info = GeneratedPartInfo(name=part_name, description=part_desc, status="generated")
+        else:
+            part.status = PartStatus.ERROR
+            part.error_message = result.error
+            info = GeneratedPartInfo(
+                name=part_name,
+                description=part_desc,
+                status="error",
+                error=result.error
+            )
+    except Exception as e:
+        part.status = PartStatus.ERROR
+        part.error_message = str(e)
+        info = GeneratedPartInfo(name=part_name, description=part_desc, status="error", error=str(e))
+    
+    return part, info
+
+
+async def _build_generated_parts(project_id: UUID, parts_data: list[dict]) -> list[tuple[Part, GeneratedPartInfo]]:
+    """Build generated parts concurrently, at most one per sandbox worker.
+    
+    Parts beyond the pool size wait for a slot here rather than in the pool,
+    so each still gets its full execution timeout.
+    """
+    limit = asyncio.Semaphore(settings.cad_worker_pool_max)
+    
+    async def build(part_data: dict) -> tuple[Part, GeneratedPartInfo]:
+        async with limit:
+            return await _build_generated_part(project_id, part_data)
+    
+    return await asyncio.gather(*(build(part_data) for part_data in parts_data))
+
+
 @router.post("/parts/{part_id}/generate", response_model=PartResponse)
 async def generate_part_code(
     part_id: UUID,
@@ -142,7 +227,6 @@ async def generate_part_code(
         part.error_message = str(e)
     
     await db.commit()
-    await db.refresh(part)
     return part
 
 
@@ -230,7 +314,6 @@ async def generate_part_with_agents(
         part.error_message = str(e)
     
     await db.commit()
-    await db.refresh(part)
     return part
 
 
@@ -263,9 +346,8 @@ async def generate_part_with_image(
             detail=f"Invalid image type. Allowed: {', '.join(allowed_types)}",
         )
     
-    # Read and encode image
-    image_content = await image.read()
-    image_data = base64.b64encode(image_content).decode("utf-8")
+    # Raw bytes: the agent pipeline base64-encodes when building the request
+    image_data = await image.read()
     image_mime_type = image.content_type
     
     provider_to_use = provider or settings.default_llm_provider
@@ -300,7 +382,6 @@ async def generate_part_with_image(
         part.error_message = str(e)
     
     await db.commit()
-    await db.refresh(part)
     return part
 
 
@@ -312,8 +393,6 @@ async def analyze_image_for_design(
     model: str = Form(None),
 ):
     """Analyze an image and return design suggestions without generating code."""
-    from app.prompts.agent_prompts import DESIGN_WITH_IMAGE_PROMPT
-    
     allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
     if image.content_type not in allowed_types:
         raise HTTPException(
@@ -359,7 +438,7 @@ Réponds en JSON:
         )
         
         # Try to parse as JSON
-        json_match = re.search(r'\{[\s\S]*\}', response)
+        json_match = _JSON_RE.search(response)
         if json_match:
             analysis = json.loads(json_match.group())
             return {"success": True, "analysis": analysis}
@@ -378,8 +457,6 @@ async def generate_assembly_positions(
     request: AssemblyRequest,
 ):
     """Generate part positions from natural language instruction."""
-    from app.prompts.assembly_system import ASSEMBLY_SYSTEM_PROMPT
-    
     # Build the context about current parts
     parts_info = []
     for p in request.parts:
@@ -410,7 +487,7 @@ Retourne les nouvelles positions au format JSON."""
         )
         
         # Extract JSON from response
-        json_match = re.search(r'\{[\s\S]*\}', response)
+        json_match = _JSON_RE.search(response)
         if not json_match:
             raise ValueError("No JSON found in response")
         
@@ -449,9 +526,6 @@ async def generate_project(
     db: AsyncSession = Depends(get_db),
 ):
     """Generate a complete project with multiple parts from a description."""
-    from app.prompts.project_system import PROJECT_SYSTEM_PROMPT
-    from sqlalchemy.orm import selectinload
-    
     provider = request.provider or settings.default_llm_provider
     
     try:
@@ -463,56 +537,10 @@ async def generate_project(
             model=request.model
         )
         
-        # Extract JSON from response - try multiple methods
-        json_str = None
-        
-        # Method 1: Try to extract from ```json ... ``` block
-        json_block_match = re.search(r'```(?:json)?\s*(\{[\s\S]*?\})\s*```', response)
-        if json_block_match:
-            json_str = json_block_match.group(1)
-        
-        # Method 2: Find the outermost JSON object
-        if not json_str:
-            # Find first { and last } to get the complete JSON object
-            start_idx = response.find('{')
-            if start_idx != -1:
-                # Count braces to find matching closing brace
-                depth = 0
-                end_idx = start_idx
-                in_string = False
-                escape_next = False
-                for i, char in enumerate(response[start_idx:], start_idx):
-                    if escape_next:
-                        escape_next = False
-                        continue
-                    if char == '\\':
-                        escape_next = True
-                        continue
-                    if char == '"' and not escape_next:
-                        in_string = not in_string
-                    if not in_string:
-                        if char == '{':
-                            depth += 1
-                        elif char == '}':
-                            depth -= 1
-                            if depth == 0:
-                                end_idx = i
-                                break
-                json_str = response[start_idx:end_idx + 1]
-        
-        if not json_str:
+        data = extract_json(response)
+        if not data:
             raise ValueError("No JSON found in LLM response")
         
-        # Try to parse, with cleanup on failure
-        try:
-            data = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            # Try to fix common issues: unescaped newlines in code strings
-            # Replace literal newlines in strings with \n
-            fixed_json = json_str
-            # This is a simplified fix - in production you'd want more robust handling
-            raise ValueError(f"Invalid JSON in LLM response: {str(e)}")
-        
         project_name = data.get("project_name", "Nouveau projet")
         parts_data = data.get("parts", [])
         
@@ -524,59 +552,12 @@ async def generate_project(
         db.add(project)
         await db.flush()  # Get the project ID
         
-        # Create and process each part
+        # Create and process the parts concurrently (CAD execution runs in subprocesses)
+        results = await _build_generated_parts(project.id, parts_data)
         generated_parts = []
-        for part_data in parts_data:
-            part_name = part_data.get("name", "Part")
-            part_code = part_data.get("code", "")
-            part_desc = part_data.get("description", "")
-            
-            # Create part
-            part = Part(
-                project_id=project.id,
-                name=part_name,
-                code=part_code,
-                prompt=part_desc,
-            )
-            
-            # Try to execute the code
-            try:
-                # Extract parameters
-                params = parameter_service.extract_parameters(part_code)
-                part.parameters = params
-                
-                # Execute code
-                result = await cad_service.execute_code(part_code)
-                
-                if result.success:
-                    part.bounding_box = result.bounding_box
-                    part.status = PartStatus.GENERATED
-                    part.error_message = None
-                    generated_parts.append(GeneratedPartInfo(
-                        name=part_name,
-                        description=part_desc,
-                        status="generated"
-                    ))
-                else:
-                    part.status = PartStatus.ERROR
-                    part.error_message = result.error
-                    generated_parts.append(GeneratedPartInfo(
-                        name=part_name,
-                        description=part_desc,
-                        status="error",
-                        error=result.error
-                    ))
-            except Exception as e:
-                part.status = PartStatus.ERROR
-                part.error_message = str(e)
-                generated_parts.append(GeneratedPartInfo(
-                    name=part_name,
-                    description=part_desc,
-                    status="error",
-                    error=str(e)
-                ))
-            
+        for part, info in results:
             db.add(part)
+            generated_parts.append(info)
         
         await db.commit()
         
@@ -586,11 +567,6 @@ async def generate_project(
             parts=generated_parts
         )
         
-    except json.JSONDecodeError as e:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Invalid JSON in LLM response: {str(e)}"
-        )
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -619,9 +595,6 @@ async def generate_project_with_images(
     db: AsyncSession = Depends(get_db),
 ):
     """Generate a complete project with multiple parts from images and description."""
-    from app.prompts.project_system import PROJECT_SYSTEM_PROMPT
-    from sqlalchemy.orm import selectinload
-    
     provider = request.provider or settings.default_llm_provider
     
     if not request.prompt and not request.images:
@@ -666,45 +639,10 @@ async def generate_project_with_images(
                 model=request.model
             )
         
-        # Extract JSON from response - try multiple methods
-        json_str = None
-        
-        # Method 1: Try to extract from ```json ... ``` block
-        json_block_match = re.search(r'```(?:json)?\s*(\{[\s\S]*?\})\s*```', response)
-        if json_block_match:
-            json_str = json_block_match.group(1)
-        
-        # Method 2: Find the outermost JSON object
-        if not json_str:
-            start_idx = response.find('{')
-            if start_idx != -1:
-                depth = 0
-                end_idx = start_idx
-                in_string = False
-                escape_next = False
-                for i, char in enumerate(response[start_idx:], start_idx):
-                    if escape_next:
-                        escape_next = False
-                        continue
-                    if char == '\\':
-                        escape_next = True
-                        continue
-                    if char == '"' and not escape_next:
-                        in_string = not in_string
-                    if not in_string:
-                        if char == '{':
-                            depth += 1
-                        elif char == '}':
-                            depth -= 1
-                            if depth == 0:
-                                end_idx = i
-                                break
-                json_str = response[start_idx:end_idx + 1]
-        
-        if not json_str:
+        data = extract_json(response)
+        if not data:
             raise ValueError("No JSON found in LLM response")
         
-        data = json.loads(json_str)
         project_name = data.get("project_name", "Nouveau projet")
         parts_data = data.get("parts", [])
         
@@ -716,54 +654,12 @@ async def generate_project_with_images(
         db.add(project)
         await db.flush()
         
-        # Create and process each part
+        # Create and process the parts concurrently (CAD execution runs in subprocesses)
+        results = await _build_generated_parts(project.id, parts_data)
         generated_parts = []
-        for part_data in parts_data:
-            part_name = part_data.get("name", "Part")
-            part_code = part_data.get("code", "")
-            part_desc = part_data.get("description", "")
-            
-            part = Part(
-                project_id=project.id,
-                name=part_name,
-                code=part_code,
-                prompt=part_desc,
-            )
-            
-            try:
-                params = parameter_service.extract_parameters(part_code)
-                part.parameters = params
-                result = await cad_service.execute_code(part_code)
-                
-                if result.success:
-                    part.bounding_box = result.bounding_box
-                    part.status = PartStatus.GENERATED
-                    part.error_message = None
-                    generated_parts.append(GeneratedPartInfo(
-                        name=part_name,
-                        description=part_desc,
-                        status="generated"
-                    ))
-                else:
-                    part.status = PartStatus.ERROR
-                    part.error_message = result.error
-                    generated_parts.append(GeneratedPartInfo(
-                        name=part_name,
-                        description=part_desc,
-                        status="error",
-                        error=result.error
-                    ))
-            except Exception as e:
-                part.status = PartStatus.ERROR
-                part.error_message = str(e)
-                generated_parts.append(GeneratedPartInfo(
-                    name=part_name,
-                    description=part_desc,
-                    status="error",
-                    error=str(e)
-                ))
-            
+        for part, info in results:
             db.add(part)
+            generated_parts.append(info)
         
         await db.commit()
         
@@ -773,11 +669,6 @@ async def generate_project_with_images(
             parts=generated_parts
         )
         
-    except json.JSONDecodeError as e:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Invalid JSON in LLM response: {str(e)}"
-        )
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -1,12 +1,19 @@
 """Router for importing 3D files."""
 import os
+import hashlib
+from typing import AsyncIterator
+from urllib.parse import unquote
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from aiofiles.tempfile import NamedTemporaryFile
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import Project, Part
+from app.database import get_db, is_fk_violation
+from app.models import Part
 from app.models.part import PartStatus
 from app.schemas import PartResponse
 from app.services.import_service import import_service
@@ -18,50 +25,61 @@ router = APIRouter(prefix="/import", tags=["import"])
 # Maximum file size: 50MB
 MAX_FILE_SIZE = 50 * 1024 * 1024
 
+# Uploads are streamed to disk in 1MB chunks
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-@router.post("/file", response_model=PartResponse)
-async def import_file(
-    project_id: UUID = Form(...),
-    file: UploadFile = File(...),
-    db: AsyncSession = Depends(get_db),
-):
-    """Import a 3D file (STL, OBJ, 3MF) and create a new part."""
-    # Verify project exists
-    project_query = select(Project).where(Project.id == project_id)
-    result = await db.execute(project_query)
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
-    
-    # Check file extension
-    filename = file.filename or "unknown"
-    allowed_extensions = ['.stl', '.obj', '.3mf']
+
+# Allowed 3D file extensions
+ALLOWED_EXTENSIONS = ['.stl', '.obj', '.3mf']
+
+
+def _check_extension(filename: str) -> str:
+    """Return the lowercased extension of filename, or raise if unsupported."""
     ext = os.path.splitext(filename.lower())[1]
     
-    if ext not in allowed_extensions:
+    if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}",
+            detail=f"Unsupported file format. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
         )
     
-    # Check file size
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB",
-        )
-    
-    # Reset file position for parsing
-    import io
-    file_obj = io.BytesIO(content)
-    
-    # Parse the file
-    import_result = import_service.import_file(file_obj, filename)
+    return ext
+
+
+async def _read_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Yield a multipart upload in UPLOAD_CHUNK_SIZE chunks."""
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def _import_mesh(
+    db: AsyncSession,
+    project_id: UUID,
+    filename: str,
+    ext: str,
+    chunks: AsyncIterator[bytes],
+) -> Part:
+    """Spool an uploaded 3D file to disk, parse it and create the imported part."""
+    # Stream the upload to disk in chunks, enforcing the size limit as we go,
+    # then parse it off the event loop
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    # The digest (extension + content) addresses the stored mesh, so identical
+    # uploads share one file
+    hasher = hashlib.sha256(ext.encode())
+    async with NamedTemporaryFile(dir=settings.temp_dir, suffix=ext) as tmp:
+        size = 0
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB",
+                )
+            hasher.update(chunk)
+            await tmp.write(chunk)
+        await tmp.flush()
+        
+        import_result = await run_in_threadpool(import_service.import_file, tmp.name, filename)
     
     if not import_result.success:
         raise HTTPException(
@@ -72,13 +90,6 @@ async def import_file(
     # Generate a name from filename
     part_name = os.path.splitext(filename)[0]
     
-    # Store mesh data as JSON for the viewer
-    mesh_data = {
-        "vertices": import_result.vertices,
-        "faces": import_result.faces,
-        "source_file": filename,
-    }
-    
     # Calculate dimensions from bounding box for the schema
     bb = import_result.bounding_box
     bounding_box_data = {
@@ -87,6 +98,8 @@ async def import_file(
         "z": bb["max_z"] - bb["min_z"],
     }
     
+    mesh_digest = hasher.hexdigest()
+    
     # Create the part with imported mesh
     part = Part(
         project_id=project_id,
@@ -94,55 +107,100 @@ async def import_file(
         code=f"# Imported from: {filename}\n# This part was imported from a 3D file.\n# Vertices: {len(import_result.vertices)}\n# Faces: {len(import_result.faces)}",
         status=PartStatus.GENERATED,
         bounding_box=bounding_box_data,
+        mesh_digest=mesh_digest,
         parameters=[
             {"name": "vertices_count", "value": float(len(import_result.vertices)), "line": 3, "unit": ""},
             {"name": "faces_count", "value": float(len(import_result.faces)), "line": 4, "unit": ""},
         ],
     )
     
-    # Store mesh data in a separate field - we need to add this to the model
-    # For now, we'll save it as a temp file
-    import json
-    mesh_path = os.path.join(settings.temp_dir, f"{part.id}_mesh.json")
-    with open(mesh_path, 'w') as f:
-        json.dump(mesh_data, f)
+    # Store mesh data for the viewer (no-op if this content was imported before),
+    # under the digest's lock until the commit so a concurrent release can't
+    # remove the file before the new part references it
+    await import_service.lock_mesh(db, mesh_digest)
+    await run_in_threadpool(
+        import_service.store_mesh, mesh_digest, import_result.vertices, import_result.faces
+    )
     
+    # The project_id foreign key doubles as the existence check
     db.add(part)
-    await db.commit()
-    await db.refresh(part)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        await import_service.release_meshes(db, [mesh_digest])
+        if not is_fk_violation(e, "parts_project_id_fkey"):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found",
+        )
     
     return part
 
 
+@router.post("/file", response_model=PartResponse)
+async def import_file(
+    project_id: UUID = Form(...),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+):
+    """Import a 3D file (STL, OBJ, 3MF) and create a new part."""
+    filename = file.filename or "unknown"
+    ext = _check_extension(filename)
+    return await _import_mesh(db, project_id, filename, ext, _read_upload(file))
+
+
+@router.post("/file-raw/{project_id}", response_model=PartResponse)
+async def import_file_raw(
+    project_id: UUID,
+    request: Request,
+    x_filename: str = Header(...),
+    db: AsyncSession = Depends(get_db),
+):
+    """Import a 3D file sent as the raw request body (no multipart parsing).
+    
+    The file name is passed URL-encoded in the X-Filename header.
+    """
+    filename = unquote(x_filename) or "unknown"
+    ext = _check_extension(filename)
+    return await _import_mesh(db, project_id, filename, ext, request.stream())
+
+
 @router.get("/mesh/{part_id}")
 async def get_imported_mesh(
     part_id: UUID,
     db: AsyncSession = Depends(get_db),
 ):
     """Get the mesh data for an imported part."""
-    import json
-    
     # Verify part exists
-    query = select(Part).where(Part.id == part_id)
+    query = select(Part.mesh_digest).where(Part.id == part_id)
     result = await db.execute(query)
-    part = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not part:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Part not found",
         )
     
-    # Try to load mesh data
-    mesh_path = os.path.join(settings.temp_dir, f"{part_id}_mesh.json")
+    mesh_digest = row.mesh_digest
+    mesh_path = import_service.mesh_path(mesh_digest) if mesh_digest else None
     
-    if not os.path.exists(mesh_path):
+    if not mesh_path or not os.path.exists(mesh_path):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Mesh data not found",
         )
     
-    with open(mesh_path, 'r') as f:
-        mesh_data = json.load(f)
-    
-    return mesh_data
+    # Serve the stored arrays as-is; content-addressed files never change
+    return FileResponse(
+        mesh_path,
+        media_type="application/octet-stream",
+        filename=f"{part_id}_mesh.bin",
+        content_disposition_type="inline",
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{mesh_digest}"',
+        },
+    )
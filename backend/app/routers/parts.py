@@ -1,12 +1,16 @@
 from uuid import UUID
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import Project, Part, PartVersion
+from app.database import get_db, is_fk_violation
+from app.models import Part
 from app.models.part import PartStatus
+from app.routers.versions import create_version
 from app.schemas import (
     PartCreate,
     PartUpdate,
@@ -18,27 +22,9 @@ from app.schemas import (
 )
 from app.services.cad_service import cad_service
 from app.services.parameter_service import parameter_service
+from app.services.import_service import import_service
 
 
-async def create_version(
-    db: AsyncSession,
-    part: Part,
-    source: str = "manual",
-) -> PartVersion:
-    """Create a new version snapshot of a part."""
-    version = PartVersion(
-        part_id=part.id,
-        code=part.code,
-        prompt=part.prompt,
-        parameters=part.parameters,
-        bounding_box=part.bounding_box,
-        status=part.status.value if hasattr(part.status, 'value') else str(part.status),
-        error_message=part.error_message,
-        source=source,
-    )
-    db.add(version)
-    return version
-
 router = APIRouter()
 
 # Router for project-scoped operations (mounted at /api)
@@ -57,23 +43,12 @@ async def create_part(
     db: AsyncSession = Depends(get_db),
 ):
     """Create a new part in a project."""
-    # Check project exists
-    query = select(Project).where(Project.id == project_id)
-    result = await db.execute(query)
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
-    
     part = Part(project_id=project_id, **part_in.model_dump())
     
     # If code is provided, try to extract parameters and execute
     if part.code:
         try:
-            params = parameter_service.extract_parameters(part.code)
+            params = await run_in_threadpool(parameter_service.extract_parameters, part.code)
             part.parameters = params
             
             result = await cad_service.execute_code(part.code)
@@ -87,9 +62,18 @@ async def create_part(
             part.status = PartStatus.ERROR
             part.error_message = str(e)
     
+    # The project_id foreign key doubles as the existence check
     db.add(part)
-    await db.commit()
-    await db.refresh(part)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_fk_violation(e, "parts_project_id_fkey"):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found",
+        )
     return part
 
 
@@ -138,7 +122,7 @@ async def update_part(
     # Re-execute if code changed
     if code_changed and part.code:
         try:
-            params = parameter_service.extract_parameters(part.code)
+            params = await run_in_threadpool(parameter_service.extract_parameters, part.code)
             part.parameters = params
             
             result = await cad_service.execute_code(part.code)
@@ -154,7 +138,6 @@ async def update_part(
             part.error_message = str(e)
     
     await db.commit()
-    await db.refresh(part)
     return part
 
 
@@ -174,8 +157,10 @@ async def delete_part(
             detail="Part not found",
         )
     
+    mesh_digest = part.mesh_digest
     await db.delete(part)
     await db.commit()
+    await import_service.release_meshes(db, [mesh_digest])
 
 
 class ExecuteRequest(BaseModel):
@@ -214,13 +199,12 @@ async def autosave_part_code(
         
         # Extract parameters (quick operation, no CAD execution)
         try:
-            params = parameter_service.extract_parameters(request.code)
+            params = await run_in_threadpool(parameter_service.extract_parameters, request.code)
             part.parameters = params
         except Exception:
             pass  # Ignore parameter extraction errors in autosave
         
         await db.commit()
-        await db.refresh(part)
     
     return part
 
@@ -251,7 +235,7 @@ async def execute_part_code(
     
     # Extract parameters and execute
     try:
-        params = parameter_service.extract_parameters(request.code)
+        params = await run_in_threadpool(parameter_service.extract_parameters, request.code)
         part.parameters = params
         
         result = await cad_service.execute_code(request.code)
@@ -267,7 +251,6 @@ async def execute_part_code(
         part.error_message = str(e)
     
     await db.commit()
-    await db.refresh(part)
     return part
 
 
@@ -326,11 +309,13 @@ async def update_part_parameters(
     
     # Inject new parameter values into code
     try:
-        new_code = parameter_service.inject_parameters(part.code, params_in.parameters)
+        new_code = await run_in_threadpool(
+            parameter_service.inject_parameters, part.code, params_in.parameters
+        )
         part.code = new_code
         
         # Re-extract parameters and execute
-        params = parameter_service.extract_parameters(new_code)
+        params = await run_in_threadpool(parameter_service.extract_parameters, new_code)
         part.parameters = params
         
         result = await cad_service.execute_code(new_code)
@@ -346,7 +331,6 @@ async def update_part_parameters(
         part.error_message = str(e)
     
     await db.commit()
-    await db.refresh(part)
     return part
 
 
@@ -375,12 +359,16 @@ async def validate_part(
     
     bbox = part.bounding_box
     build = validate_in.build_volume
+    extra_builds = validate_in.build_volumes or []
     
-    overflow_x = max(0, bbox["x"] - build.x)
-    overflow_y = max(0, bbox["y"] - build.y)
-    overflow_z = max(0, bbox["z"] - build.z)
+    # Overflow against every build volume at once: row 0 is the primary printer
+    dims = np.array([bbox["x"], bbox["y"], bbox["z"]], dtype=np.float64)
+    builds = np.array([[b.x, b.y, b.z] for b in [build, *extra_builds]], dtype=np.float64)
+    overflows = np.maximum(0.0, dims - builds)
+    fits_mask = (overflows == 0).all(axis=1)
     
-    fits = overflow_x == 0 and overflow_y == 0 and overflow_z == 0
+    overflow_x, overflow_y, overflow_z = (float(v) for v in overflows[0])
+    fits = bool(fits_mask[0])
     
     suggestions = []
     if overflow_x > 0:
@@ -399,4 +387,5 @@ async def validate_part(
         build_volume=build,
         overflow=BoundingBox(x=overflow_x, y=overflow_y, z=overflow_z),
         suggestions=suggestions,
+        fits_build_volumes=fits_mask[1:].tolist() if extra_builds else None,
     )
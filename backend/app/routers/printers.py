@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+import hashlib
+import orjson
+from fastapi import APIRouter, Request, Response
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -93,7 +95,18 @@ PRINTER_PRESETS: list[PrinterPreset] = [
 ]
 
 
+# Presets never change at runtime, so serialize them once at import
+_PRESETS_JSON = orjson.dumps([p.model_dump() for p in PRINTER_PRESETS])
+_PRESETS_ETAG = f'"{hashlib.sha1(_PRESETS_JSON).hexdigest()}"'
+_PRESETS_HEADERS = {
+    "Cache-Control": "public, max-age=86400, immutable",
+    "ETag": _PRESETS_ETAG,
+}
+
+
 @router.get("/presets", response_model=list[PrinterPreset])
-async def get_printer_presets():
+async def get_printer_presets(request: Request):
     """Get list of predefined printer profiles."""
-    return PRINTER_PRESETS
+    if request.headers.get("if-none-match") == _PRESETS_ETAG:
+        return Response(status_code=304, headers=_PRESETS_HEADERS)
+    return Response(content=_PRESETS_JSON, media_type="application/json", headers=_PRESETS_HEADERS)
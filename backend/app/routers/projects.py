@@ -1,11 +1,12 @@
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, literal, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database import get_db
 from app.models import Project, Part
+from app.services.import_service import import_service
 from app.schemas import (
     ProjectCreate,
     ProjectUpdate,
@@ -23,14 +24,14 @@ async def list_projects(
     db: AsyncSession = Depends(get_db),
 ):
     """List projects with parts count. Filter by section or get unsectioned projects."""
-    query = (
-        select(
-            Project,
-            func.count(Part.id).label("parts_count"),
-        )
-        .outerjoin(Part)
-        .group_by(Project.id)
+    # Correlated count so each project is a lookup on the parts.project_id index
+    parts_count = (
+        select(func.count(Part.id))
+        .where(Part.project_id == Project.id)
+        .correlate(Project)
+        .scalar_subquery()
     )
+    query = select(Project, parts_count.label("parts_count"))
     
     if unsectioned:
         query = query.where(Project.section_id.is_(None))
@@ -100,18 +101,24 @@ async def get_project(
     return project
 
 
-@router.put("/{project_id}", response_model=ProjectResponse)
-async def update_project(
-    project_id: UUID,
-    project_in: ProjectUpdate,
-    db: AsyncSession = Depends(get_db),
-):
-    """Update a project."""
+async def _update_project(db: AsyncSession, project_id: UUID, values: dict) -> Project:
+    """Apply values with a single UPDATE ... RETURNING, eager-loading parts."""
     query = (
         select(Project)
         .options(selectinload(Project.parts))
         .where(Project.id == project_id)
     )
+    
+    if values:
+        query = (
+            update(Project)
+            .where(Project.id == project_id)
+            .values(**values)
+            .returning(Project)
+            .options(selectinload(Project.parts))
+            .execution_options(populate_existing=True)
+        )
+    
     result = await db.execute(query)
     project = result.scalar_one_or_none()
     
@@ -121,15 +128,21 @@ async def update_project(
             detail="Project not found",
         )
     
-    update_data = project_in.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(project, field, value)
-    
     await db.commit()
-    await db.refresh(project)
     return project
 
 
+@router.put("/{project_id}", response_model=ProjectResponse)
+async def update_project(
+    project_id: UUID,
+    project_in: ProjectUpdate,
+    db: AsyncSession = Depends(get_db),
+):
+    """Update a project."""
+    update_data = project_in.model_dump(exclude_unset=True)
+    return await _update_project(db, project_id, update_data)
+
+
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_project(
     project_id: UUID,
@@ -146,8 +159,15 @@ async def delete_project(
             detail="Project not found",
         )
     
+    # Imported meshes referenced by this project's parts, released after the delete
+    digests_query = select(Part.mesh_digest).where(
+        Part.project_id == project_id, Part.mesh_digest.is_not(None)
+    )
+    mesh_digests = list((await db.execute(digests_query)).scalars())
+    
     await db.delete(project)
     await db.commit()
+    await import_service.release_meshes(db, mesh_digests)
 
 
 @router.post("/{project_id}/duplicate", response_model=ProjectResponse)
@@ -156,13 +176,8 @@ async def duplicate_project(
     db: AsyncSession = Depends(get_db),
 ):
     """Duplicate a project with all its parts."""
-    # Get original project with parts
-    query = (
-        select(Project)
-        .options(selectinload(Project.parts))
-        .where(Project.id == project_id)
-    )
-    result = await db.execute(query)
+    # Get original project
+    result = await db.execute(select(Project).where(Project.id == project_id))
     original = result.scalar_one_or_none()
     
     if not original:
@@ -181,17 +196,27 @@ async def duplicate_project(
     db.add(new_project)
     await db.flush()
     
-    # Duplicate parts
-    for part in original.parts:
-        new_part = Part(
-            project_id=new_project.id,
-            name=part.name,
-            code=part.code,
-            prompt=part.prompt,
-            status=part.status,
-            error_message=part.error_message,
+    # Duplicate parts server-side with a single INSERT ... SELECT. The model's
+    # id/timestamp defaults are Python-side, so supply them in SQL here.
+    now = func.timezone("utc", func.now())
+    await db.execute(
+        insert(Part).from_select(
+            ["id", "project_id", "name", "code", "prompt", "status", "error_message",
+             "created_at", "updated_at"],
+            select(
+                func.gen_random_uuid(),
+                literal(new_project.id, type_=Part.project_id.type),
+                Part.name,
+                Part.code,
+                Part.prompt,
+                Part.status,
+                Part.error_message,
+                now,
+                now,
+            ).where(Part.project_id == project_id),
+            include_defaults=False,
         )
-        db.add(new_part)
+    )
     
     await db.commit()
     
@@ -213,26 +238,10 @@ async def move_project(
     db: AsyncSession = Depends(get_db),
 ):
     """Move a project to a different section or position."""
-    query = (
-        select(Project)
-        .options(selectinload(Project.parts))
-        .where(Project.id == project_id)
-    )
-    result = await db.execute(query)
-    project = result.scalar_one_or_none()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
-    
     # Update section if provided (can be None to unsection)
-    project.section_id = section_id
+    values = {"section_id": section_id}
     
     if position is not None:
-        project.position = position
+        values["position"] = position
     
-    await db.commit()
-    await db.refresh(project)
-    return project
+    return await _update_project(db, project_id, values)
@@ -1,10 +1,14 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from datetime import datetime
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import JSON, bindparam, lambda_stmt, literal_column, select, func, insert, update, delete
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database import get_db
+from app.database import get_db, guarded_loads
 from app.models import Section, Project, Part
 from app.schemas.section import (
     SectionCreate,
@@ -12,52 +16,136 @@ from app.schemas.section import (
     SectionResponse,
     SectionWithProjects,
 )
+from app.schemas.project import ProjectSummary
+from app.services import sections_cache
 
 
-router = APIRouter(prefix="/sections", tags=["sections"])
+router = APIRouter(prefix="/sections", tags=["sections"], default_response_class=ORJSONResponse)
+
+
+async def _parts_counts(db: AsyncSession, project_ids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+    """Count parts per project with one aggregate query instead of loading them."""
+    if not project_ids:
+        return {}
+    
+    result = await db.execute(
+        select(Part.project_id, func.count(Part.id))
+        .where(Part.project_id.in_(project_ids))
+        .group_by(Part.project_id)
+    )
+    return dict(result.all())
+
+
+def _list_sections_query():
+    """Sections with their projects aggregated in SQL as a sorted JSON array.
+    
+    One statement returns everything: projects are ordered by the aggregate
+    and parts are counted per project by a correlated subquery.
+    """
+    parts_count = (
+        select(func.count(Part.id))
+        .where(Part.project_id == Project.id)
+        .correlate(Project)
+        .scalar_subquery()
+    )
+    project_json = func.json_build_object(
+        "id", Project.id,
+        "name", Project.name,
+        "description", Project.description,
+        "position", Project.position,
+        "created_at", Project.created_at,
+        "updated_at", Project.updated_at,
+        "parts_count", parts_count,
+    )
+    projects = func.coalesce(
+        func.json_agg(
+            aggregate_order_by(project_json, Project.position, Project.created_at)
+        ).filter(Project.id.is_not(None)),
+        literal_column("'[]'::json"),
+        type_=JSON,
+    )
+    return (
+        select(Section, projects.label("projects"))
+        .options(*guarded_loads())
+        .outerjoin(Project, Project.section_id == Section.id)
+        .group_by(Section.id)
+        .order_by(Section.position, Section.created_at)
+    )
+
+
+# Built once as lambda statements so their compiled form is cached
+_LIST_SECTIONS_STMT = lambda_stmt(lambda: _list_sections_query())
+_GET_SECTION_STMT = lambda_stmt(
+    lambda: select(Section)
+    .options(*guarded_loads(selectinload(Section.projects)))
+    .where(Section.id == bindparam("section_id"))
+)
+
+
+def _next_section_position():
+    """SQL expression for the position after the last section, evaluated in the INSERT."""
+    return select(func.coalesce(func.max(Section.position), 0) + 1).scalar_subquery()
+
+
+def _section_with_projects(section: Section, counts: dict[uuid.UUID, int]) -> SectionWithProjects:
+    """Build a section response from loaded ORM rows without re-validating them."""
+    return SectionWithProjects.model_construct(
+        id=section.id,
+        name=section.name,
+        color=section.color,
+        position=section.position,
+        created_at=section.created_at,
+        updated_at=section.updated_at,
+        projects_count=len(section.projects),
+        projects=[
+            ProjectSummary.model_construct(
+                id=p.id,
+                name=p.name,
+                description=p.description,
+                position=p.position,
+                created_at=p.created_at,
+                updated_at=p.updated_at,
+                parts_count=counts.get(p.id, 0),
+            )
+            for p in section.projects
+        ],
+    )
+
+
+# list_sections caches its last body for a short TTL (see sections_cache),
+# keyed on the latest section and project update times; both are indexed,
+# so each max is one index probe
+_SECTIONS_STATE = select(
+    select(func.max(Section.updated_at)).scalar_subquery(),
+    select(func.max(Project.updated_at)).scalar_subquery(),
+)
 
 
 @router.get("", response_model=list[SectionWithProjects])
 async def list_sections(db: AsyncSession = Depends(get_db)):
     """List all sections with their projects."""
-    # Load sections with projects and parts (nested eager loading)
-    query = (
-        select(Section)
-        .options(
-            selectinload(Section.projects).selectinload(Project.parts)
-        )
-        .order_by(Section.position, Section.created_at)
-    )
-    result = await db.execute(query)
-    sections = result.scalars().all()
+    # Serve the cached body while the listing state is unchanged
+    state = tuple((await db.execute(_SECTIONS_STATE)).one())
+    body = sections_cache.get(state)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
     
-    # Build response with project counts
-    response = []
-    for section in sections:
-        section_dict = {
+    result = await db.execute(_LIST_SECTIONS_STMT)
+    body = orjson.dumps([
+        {
             "id": section.id,
             "name": section.name,
             "color": section.color,
             "position": section.position,
             "created_at": section.created_at,
             "updated_at": section.updated_at,
-            "projects_count": len(section.projects),
-            "projects": [
-                {
-                    "id": p.id,
-                    "name": p.name,
-                    "description": p.description,
-                    "position": p.position,
-                    "created_at": p.created_at,
-                    "updated_at": p.updated_at,
-                    "parts_count": len(p.parts),
-                }
-                for p in sorted(section.projects, key=lambda x: (x.position, x.created_at))
-            ],
+            "projects_count": len(projects),
+            "projects": projects,
         }
-        response.append(section_dict)
-    
-    return response
+        for section, projects in result.all()
+    ])
+    sections_cache.put(state, body)
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("", response_model=SectionResponse, status_code=status.HTTP_201_CREATED)
@@ -66,17 +154,13 @@ async def create_section(
     db: AsyncSession = Depends(get_db),
 ):
     """Create a new section."""
-    # Get max position
-    result = await db.execute(select(func.max(Section.position)))
-    max_pos = result.scalar() or 0
-    
-    section = Section(
-        **section_in.model_dump(),
-        position=max_pos + 1,
+    result = await db.execute(
+        insert(Section)
+        .values(**section_in.model_dump(), position=_next_section_position())
+        .returning(Section)
     )
-    db.add(section)
+    section = result.scalar_one()
     await db.commit()
-    await db.refresh(section)
     
     return {
         **section.__dict__,
@@ -90,40 +174,16 @@ async def get_section(
     db: AsyncSession = Depends(get_db),
 ):
     """Get a section by ID."""
-    query = (
-        select(Section)
-        .options(
-            selectinload(Section.projects).selectinload(Project.parts)
-        )
-        .where(Section.id == section_id)
-    )
-    result = await db.execute(query)
+    result = await db.execute(_GET_SECTION_STMT, {"section_id": section_id})
     section = result.scalar_one_or_none()
     
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
     
-    return {
-        "id": section.id,
-        "name": section.name,
-        "color": section.color,
-        "position": section.position,
-        "created_at": section.created_at,
-        "updated_at": section.updated_at,
-        "projects_count": len(section.projects),
-        "projects": [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "position": p.position,
-                "created_at": p.created_at,
-                "updated_at": p.updated_at,
-                "parts_count": len(p.parts),
-            }
-            for p in sorted(section.projects, key=lambda x: (x.position, x.created_at))
-        ],
-    }
+    counts = await _parts_counts(db, [p.id for p in section.projects])
+    
+    section_out = _section_with_projects(section, counts)
+    return Response(content=section_out.model_dump_json(), media_type="application/json")
 
 
 @router.patch("/{section_id}", response_model=SectionResponse)
@@ -133,24 +193,35 @@ async def update_section(
     db: AsyncSession = Depends(get_db),
 ):
     """Update a section."""
-    query = select(Section).where(Section.id == section_id)
+    update_data = section_in.model_dump(exclude_unset=True)
+    
+    # Project count comes back in the same statement as a correlated subquery
+    projects_count = (
+        select(func.count(Project.id))
+        .where(Project.section_id == Section.id)
+        .correlate(Section)
+        .scalar_subquery()
+        .label("projects_count")
+    )
+    
+    if update_data:
+        query = (
+            update(Section)
+            .where(Section.id == section_id)
+            .values(**update_data)
+            .returning(Section, projects_count)
+        )
+    else:
+        query = select(Section, projects_count).where(Section.id == section_id)
+    
     result = await db.execute(query)
-    section = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not section:
+    if not row:
         raise HTTPException(status_code=404, detail="Section not found")
     
-    update_data = section_in.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(section, key, value)
-    
+    section, projects_count = row
     await db.commit()
-    await db.refresh(section)
-    
-    # Get project count
-    count_query = select(func.count(Project.id)).where(Project.section_id == section_id)
-    count_result = await db.execute(count_query)
-    projects_count = count_result.scalar() or 0
     
     return {
         **section.__dict__,
@@ -164,21 +235,21 @@ async def delete_section(
     db: AsyncSession = Depends(get_db),
 ):
     """Delete a section. Projects in the section will become unsectioned."""
-    query = select(Section).where(Section.id == section_id)
-    result = await db.execute(query)
-    section = result.scalar_one_or_none()
-    
-    if not section:
-        raise HTTPException(status_code=404, detail="Section not found")
-    
     # Move projects to unsectioned (set section_id to null)
     await db.execute(
-        Project.__table__.update()
+        update(Project)
         .where(Project.section_id == section_id)
         .values(section_id=None)
     )
     
-    await db.delete(section)
+    result = await db.execute(
+        delete(Section).where(Section.id == section_id).returning(Section.id)
+    )
+    
+    if result.scalar_one_or_none() is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Section not found")
+    
     await db.commit()
 
 
@@ -192,7 +263,7 @@ async def duplicate_section(
     query = (
         select(Section)
         .options(
-            selectinload(Section.projects).selectinload(Project.parts)
+            *guarded_loads(selectinload(Section.projects).selectinload(Project.parts))
         )
         .where(Section.id == section_id)
     )
@@ -202,71 +273,76 @@ async def duplicate_section(
     if not original:
         raise HTTPException(status_code=404, detail="Section not found")
     
-    # Get max position
-    pos_result = await db.execute(select(func.max(Section.position)))
-    max_pos = pos_result.scalar() or 0
-    
     # Create new section
-    new_section = Section(
-        name=f"{original.name} (copie)",
-        color=original.color,
-        position=max_pos + 1,
+    result = await db.execute(
+        insert(Section)
+        .values(
+            name=f"{original.name} (copie)",
+            color=original.color,
+            position=_next_section_position(),
+        )
+        .returning(Section)
     )
-    db.add(new_section)
-    await db.flush()
+    new_section = result.scalar_one()
     
-    # Duplicate projects and their parts
-    for project in original.projects:
-        new_project = Project(
-            name=project.name,
-            description=project.description,
-            section_id=new_section.id,
-            position=project.position,
+    # Duplicate projects and their parts in two bulk INSERTs. Project ids and
+    # timestamps are pre-generated so parts can reference the projects without
+    # a flush per project and the response can be built without a reload.
+    now = datetime.utcnow()
+    project_ids = [uuid.uuid4() for _ in original.projects]
+    if project_ids:
+        await db.execute(
+            insert(Project),
+            [
+                {
+                    "id": project_id,
+                    "name": project.name,
+                    "description": project.description,
+                    "section_id": new_section.id,
+                    "position": project.position,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for project_id, project in zip(project_ids, original.projects)
+            ],
         )
-        db.add(new_project)
-        await db.flush()
-        
-        # Duplicate parts
-        for part in project.parts:
-            new_part = Part(
-                project_id=new_project.id,
-                name=part.name,
-                code=part.code,
-                prompt=part.prompt,
-                status=part.status,
-                error_message=part.error_message,
-            )
-            db.add(new_part)
     
-    await db.commit()
+    part_rows = [
+        {
+            "project_id": project_id,
+            "name": part.name,
+            "code": part.code,
+            "prompt": part.prompt,
+            "status": part.status,
+            "error_message": part.error_message,
+        }
+        for project_id, project in zip(project_ids, original.projects)
+        for part in project.parts
+    ]
+    if part_rows:
+        await db.execute(insert(Part), part_rows)
     
-    # Reload with relationships
-    query = (
-        select(Section)
-        .options(selectinload(Section.projects))
-        .where(Section.id == new_section.id)
-    )
-    result = await db.execute(query)
-    section = result.scalar_one()
+    await db.commit()
     
+    # Build the response from the duplication pass rather than reloading
     return {
-        "id": section.id,
-        "name": section.name,
-        "color": section.color,
-        "position": section.position,
-        "created_at": section.created_at,
-        "updated_at": section.updated_at,
-        "projects_count": len(section.projects),
+        "id": new_section.id,
+        "name": new_section.name,
+        "color": new_section.color,
+        "position": new_section.position,
+        "created_at": new_section.created_at,
+        "updated_at": new_section.updated_at,
+        "projects_count": len(project_ids),
         "projects": [
             {
-                "id": p.id,
+                "id": project_id,
                 "name": p.name,
                 "description": p.description,
                 "position": p.position,
-                "created_at": p.created_at,
-                "updated_at": p.updated_at,
-                "parts_count": 0,
+                "created_at": now,
+                "updated_at": now,
+                "parts_count": len(p.parts),
             }
-            for p in sorted(section.projects, key=lambda x: (x.position, x.created_at))
+            for project_id, p in zip(project_ids, original.projects)
         ],
     }
@@ -1,73 +1,94 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, desc
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, insert, select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database import get_db
+from app.database import get_db, guarded_loads
 from app.models import Part, PartVersion
+from app.models.part import PartStatus
 from app.schemas.version import VersionResponse, VersionSummary
 
 
-router = APIRouter(prefix="/versions", tags=["versions"])
+router = APIRouter(prefix="/versions", tags=["versions"], default_response_class=ORJSONResponse)
+
+
+# Compiled once and reused; version snapshots are write-only, so they skip
+# the ORM unit of work
+_VERSION_INSERT = insert(PartVersion).returning(PartVersion.id)
+
+
+def _version_row(part_id: uuid.UUID, state: Part | PartVersion, source: str) -> dict:
+    """Build a version snapshot row from the state of a part or another version."""
+    return {
+        "part_id": part_id,
+        "code": state.code,
+        "prompt": state.prompt,
+        "parameters": state.parameters,
+        "bounding_box": state.bounding_box,
+        "status": state.status.value if isinstance(state.status, PartStatus) else state.status,
+        "error_message": state.error_message,
+        "source": source,
+    }
 
 
 async def create_version(
     db: AsyncSession,
     part: Part,
     source: str = "manual",
-) -> PartVersion:
-    """Create a new version snapshot of a part."""
-    version = PartVersion(
-        part_id=part.id,
-        code=part.code,
-        prompt=part.prompt,
-        parameters=part.parameters,
-        bounding_box=part.bounding_box,
-        status=part.status.value if hasattr(part.status, 'value') else str(part.status),
-        error_message=part.error_message,
-        source=source,
-    )
-    db.add(version)
-    await db.flush()
-    return version
+) -> uuid.UUID:
+    """Create a new version snapshot of a part and return its id."""
+    result = await db.execute(_VERSION_INSERT, _version_row(part.id, part, source))
+    return result.scalar_one()
 
 
 @router.get("/part/{part_id}", response_model=list[VersionSummary])
 async def list_part_versions(
     part_id: uuid.UUID,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=500),
     db: AsyncSession = Depends(get_db),
 ):
     """List all versions for a part, most recent first."""
-    # Verify part exists
-    part_query = select(Part).where(Part.id == part_id)
-    result = await db.execute(part_query)
-    part = result.scalar_one_or_none()
-    
-    if not part:
-        raise HTTPException(status_code=404, detail="Part not found")
-    
-    # Get versions
+    # Select only the summary columns (code can be large and is only tested
+    # for emptiness), outer-joined from the part so a missing part and a part
+    # without versions are told apart in the same round trip
+    part = select(Part.id.label("pid")).where(Part.id == part_id).cte("part")
     query = (
-        select(PartVersion)
-        .where(PartVersion.part_id == part_id)
+        select(
+            part.c.pid,
+            PartVersion.id,
+            PartVersion.source,
+            PartVersion.status,
+            PartVersion.created_at,
+            # Compared rather than measured: Postgres rejects a non-empty
+            # value on its stored length without detoasting it
+            and_(PartVersion.code.is_not(None), PartVersion.code != "").label("has_code"),
+        )
+        .select_from(part)
+        .outerjoin(PartVersion, PartVersion.part_id == part.c.pid)
         .order_by(desc(PartVersion.created_at))
         .limit(limit)
     )
-    result = await db.execute(query)
-    versions = result.scalars().all()
+    rows = (await db.execute(query)).all()
     
-    return [
+    if not rows:
+        raise HTTPException(status_code=404, detail="Part not found")
+    
+    # A part without versions comes back as one row of NULL version columns
+    body = orjson.dumps([
         {
-            "id": v.id,
-            "source": v.source,
-            "status": v.status,
-            "created_at": v.created_at,
-            "has_code": bool(v.code),
+            "id": row.id,
+            "source": row.source,
+            "status": row.status,
+            "created_at": row.created_at,
+            "has_code": row.has_code,
         }
-        for v in versions
-    ]
+        for row in rows
+        if row.id is not None
+    ])
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{version_id}", response_model=VersionResponse)
@@ -92,24 +113,33 @@ async def restore_version(
     db: AsyncSession = Depends(get_db),
 ):
     """Restore a part to a specific version."""
-    # Get the version
-    query = select(PartVersion).where(PartVersion.id == version_id)
+    # Get the version and its part in one query
+    query = (
+        select(PartVersion, Part)
+        .options(*guarded_loads())
+        .outerjoin(Part, Part.id == PartVersion.part_id)
+        .where(PartVersion.id == version_id)
+    )
     result = await db.execute(query)
-    version = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not version:
+    if not row:
         raise HTTPException(status_code=404, detail="Version not found")
     
-    # Get the part
-    part_query = select(Part).where(Part.id == version.part_id)
-    result = await db.execute(part_query)
-    part = result.scalar_one_or_none()
+    version, part = row
     
     if not part:
         raise HTTPException(status_code=404, detail="Part not found")
     
-    # Create a version of current state before restoring
-    await create_version(db, part, source="before_restore")
+    # Snapshot the current state and the restored state in one executemany;
+    # rows get increasing created_at in list order
+    await db.execute(
+        _VERSION_INSERT,
+        [
+            _version_row(part.id, part, "before_restore"),
+            _version_row(part.id, version, "restore"),
+        ],
+    )
     
     # Restore the part to the version's state
     part.code = version.code
@@ -121,8 +151,4 @@ async def restore_version(
     
     await db.commit()
     
-    # Create a version marking the restore
-    await create_version(db, part, source="restore")
-    await db.commit()
-    
     return version
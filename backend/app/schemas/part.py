@@ -69,6 +69,7 @@ class PartParametersUpdate(BaseModel):
 
 class PartValidateRequest(BaseModel):
     build_volume: BoundingBox
+    build_volumes: list[BoundingBox] | None = None  # Extra printers to check in the same call
 
 
 class PartValidateResponse(BaseModel):
@@ -77,3 +78,4 @@ class PartValidateResponse(BaseModel):
     build_volume: BoundingBox
     overflow: BoundingBox
     suggestions: list[str]
+    fits_build_volumes: list[bool] | None = None  # One entry per requested build_volumes item
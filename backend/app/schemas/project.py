@@ -1,6 +1,6 @@
 from datetime import datetime
 from uuid import UUID
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 
 
 class ProjectBase(BaseModel):
@@ -50,8 +50,7 @@ class ProjectSummary(BaseModel):
     updated_at: datetime
     parts_count: int = 0
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class ProjectListResponse(BaseModel):
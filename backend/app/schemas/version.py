@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import UUID
 from typing import Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class VersionResponse(BaseModel):
@@ -16,8 +16,7 @@ class VersionResponse(BaseModel):
     source: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class VersionSummary(BaseModel):
@@ -28,5 +27,4 @@ class VersionSummary(BaseModel):
     created_at: datetime
     has_code: bool = False
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
@@ -14,18 +14,52 @@ Model strategy:
 """
 import asyncio
 import base64
-import json
+import io
 import re
-from dataclasses import dataclass, field
+import orjson
+from collections import deque
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from typing import Literal
+from typing import Awaitable, Callable, Literal
+
+from PIL import Image
 
 from app.config import settings
-from app.services.llm_service import llm_service
+from app.prompts.agent_prompts import (
+    DESIGN_AGENT_PROMPT,
+    DESIGN_WITH_IMAGE_PROMPT,
+    VALIDATION_AGENT_PROMPT,
+    OPTIMIZATION_AGENT_PROMPT,
+    REVIEW_AGENT_PROMPT,
+)
+from app.services.llm_service import (
+    llm_service,
+    OPENAI_MODELS,
+    ANTHROPIC_MODELS,
+    DEFAULT_OPENAI_MODEL,
+    DEFAULT_ANTHROPIC_MODEL,
+    CACHE_CONTROL,
+    cached_system,
+)
 from app.services.cad_service import cad_service
+from app.services.llm_json import extract_json
 from app.services.validation_service import code_validator
 
 
+# Vision input limits: Anthropic downscales anything with a long edge over
+# 1568px itself, OpenAI bills per 512px tile up to 2048px
+ANTHROPIC_IMAGE_MAX_EDGE = 1568
+OPENAI_IMAGE_MAX_EDGE = 2048
+OPENAI_IMAGE_TILE = 512
+IMAGE_JPEG_QUALITY = 85
+
+# Agent messages kept per pipeline run; older ones are dropped on long retry loops
+MAX_AGENT_MESSAGES = 64
+
+# Millimetre dimensions in a prompt, e.g. "40mm" or "12.5 mm"
+_DIM_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*mm\b", re.IGNORECASE)
+
+
 def get_fast_model() -> tuple[str, str]:
     """Get the fast model for validation/analysis (cheap & fast).
     
@@ -65,8 +99,9 @@ class AgentMessage:
 class DesignContext:
     """Context for the design process."""
     original_prompt: str
-    # Support single image (legacy) or multiple images
-    image_data: str | list[tuple[str, str]] | None = None  # Single base64 or list of (data, mime_type)
+    # Support single image (legacy) or multiple images. Image data is either
+    # a base64 string or raw bytes; it is held as bytes once preprocessed.
+    image_data: str | bytes | list[tuple[str | bytes, str]] | None = None  # Single image or list of (data, mime_type)
     image_mime_type: str | None = None  # Only used for single image
     existing_code: str | None = None
     context_parts: list[tuple[str, str]] | None = None
@@ -79,7 +114,7 @@ class DesignContext:
     bounding_box: dict | None = None
     iterations: int = 0
     max_iterations: int = 3
-    messages: list[AgentMessage] = field(default_factory=list)
+    messages: deque[AgentMessage] = field(default_factory=lambda: deque(maxlen=MAX_AGENT_MESSAGES))
     
     def has_images(self) -> bool:
         """Check if context has any images."""
@@ -87,7 +122,7 @@ class DesignContext:
             return len(self.image_data) > 0
         return self.image_data is not None
     
-    def get_images_for_vision(self) -> list[tuple[str, str]] | None:
+    def get_images_for_vision(self) -> list[tuple[str | bytes, str]] | None:
         """Get images in format suitable for vision API."""
         if isinstance(self.image_data, list):
             return self.image_data if self.image_data else None
@@ -107,17 +142,22 @@ class AgentService:
         prompt: str,
         provider: Literal["openai", "anthropic"],
         model: str | None = None,
-        image_data: str | list[tuple[str, str]] | None = None,
+        image_data: str | bytes | list[tuple[str | bytes, str]] | None = None,
         image_mime_type: str | None = None,
         existing_code: str | None = None,
         context_parts: list[tuple[str, str]] | None = None,
         printer_settings: dict | None = None,
         use_optimization: bool = True,
         use_review: bool = True,
+        review_after_optimization: bool = False,
     ) -> dict:
         """
         Run the multi-agent pipeline to generate optimized CadQuery code.
         
+        Optimization and review run concurrently, with the review scoring the
+        validated (pre-optimization) code; set review_after_optimization to
+        review the optimized code instead, at the cost of running them in turn.
+        
         Returns:
             dict with keys: code, bounding_box, suggestions, iterations, messages
         """
@@ -130,33 +170,225 @@ class AgentService:
             printer_settings=printer_settings or self._default_printer_settings(),
         )
         
+        # Shrink reference images once; every vision call below reuses them
+        if context.has_images():
+            context.image_data = await self._preprocess_images_async(context.get_images_for_vision(), provider)
+            context.image_mime_type = None
+        
         # Step 1: Design Agent generates initial code
-        context = await self._run_design_agent(context, provider, model)
+        context = await self._run_stage(AgentRole.DESIGN, self._run_design_agent, context, provider, model)
         
         if not context.code:
             return self._build_response(context, success=False, error="Design agent failed to generate code")
         
         # Step 2: Validation Agent checks the code
-        context = await self._run_validation_agent(context, provider, model)
+        context = await self._run_stage(AgentRole.VALIDATION, self._run_validation_agent, context, provider, model)
         
         # Step 3: If validation failed, retry with fixes
         while not context.validation_result.get("valid") and context.iterations < context.max_iterations:
             context.iterations += 1
-            context = await self._run_design_agent(
-                context, provider, model, 
+            context = await self._run_stage(
+                AgentRole.DESIGN, self._run_design_agent, context, provider, model,
                 fix_errors=context.validation_result.get("errors", [])
             )
-            context = await self._run_validation_agent(context, provider, model)
+            context = await self._run_stage(AgentRole.VALIDATION, self._run_validation_agent, context, provider, model)
+        
+        valid = context.validation_result.get("valid")
+        run_optimization = use_optimization and valid
+        run_review = use_review and context.image_data and valid
+        
+        if run_optimization and run_review and not review_after_optimization:
+            # Steps 4 & 5 concurrently: the review scores the pre-optimization
+            # geometry from a snapshot, then its output is merged back. If
+            # either stage raises, the TaskGroup cancels the other.
+            snapshot = replace(
+                context,
+                messages=deque(maxlen=MAX_AGENT_MESSAGES),
+                optimization_suggestions=[],
+            )
+            async with asyncio.TaskGroup() as tg:
+                optimize_task = tg.create_task(self._run_stage(
+                    AgentRole.OPTIMIZATION, self._run_optimization_agent, context, provider, model
+                ))
+                review_task = tg.create_task(self._run_stage(
+                    AgentRole.REVIEW, self._run_review_agent, snapshot, provider, model
+                ))
+            context, reviewed = optimize_task.result(), review_task.result()
+            context.messages.extend(reviewed.messages)
+            context.optimization_suggestions.extend(reviewed.optimization_suggestions)
+        else:
+            # Step 4: Optimization Agent (if enabled and validation passed)
+            if run_optimization:
+                context = await self._run_stage(AgentRole.OPTIMIZATION, self._run_optimization_agent, context, provider, model)
+            
+            # Step 5: Review Agent (if enabled and we have an image)
+            if run_review:
+                context = await self._run_stage(AgentRole.REVIEW, self._run_review_agent, context, provider, model)
+        
+        return self._build_response(context, success=context.validation_result.get("valid", False))
+    
+    async def generate_batch(
+        self,
+        prompts: list[str],
+        provider: Literal["openai", "anthropic"],
+        max_concurrency: int | None = None,
+        **kwargs,
+    ) -> list[dict | BaseException]:
+        """
+        Run the agent pipeline for several prompts concurrently.
         
-        # Step 4: Optimization Agent (if enabled and validation passed)
-        if use_optimization and context.validation_result.get("valid"):
-            context = await self._run_optimization_agent(context, provider, model)
+        At most max_concurrency pipelines (default: settings.agent_batch_concurrency)
+        run at once, to stay within provider rate limits. Results are in prompt
+        order; a pipeline that raised is returned as its exception.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or settings.agent_batch_concurrency)
         
-        # Step 5: Review Agent (if enabled and we have an image)
-        if use_review and context.image_data and context.validation_result.get("valid"):
-            context = await self._run_review_agent(context, provider, model)
+        async def run_one(prompt: str) -> dict:
+            async with semaphore:
+                return await self.generate_with_agents(prompt, provider, **kwargs)
         
-        return self._build_response(context, success=context.validation_result.get("valid", False))
+        return await asyncio.gather(*(run_one(p) for p in prompts), return_exceptions=True)
+    
+    async def generate_batch_offline(
+        self,
+        prompts: list[str],
+        provider: Literal["openai", "anthropic"],
+        model: str | None = None,
+        poll_interval: float = 30.0,
+    ) -> list[str | None]:
+        """
+        Generate CadQuery code for many prompts through the provider batch API.
+        
+        For non-interactive jobs only: batches are billed at about half the
+        real-time price but may take up to 24h. Polls every poll_interval
+        seconds and returns the extracted code per prompt, in prompt order
+        (None where the request failed). No validation or agent passes are run.
+        """
+        requests = [llm_service._build_prompt(prompt, None, None) for prompt in prompts]
+        
+        if provider == "openai":
+            outputs = await self._run_openai_batch(requests, model, poll_interval)
+        elif provider == "anthropic":
+            outputs = await self._run_anthropic_batch(requests, model, poll_interval)
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+        
+        return [
+            llm_service._extract_code(outputs[str(i)]) if str(i) in outputs else None
+            for i in range(len(prompts))
+        ]
+    
+    async def _run_openai_batch(
+        self,
+        requests: list[tuple[str, str]],
+        model: str | None,
+        poll_interval: float,
+    ) -> dict[str, str]:
+        """Submit (system, user) prompts as an OpenAI batch; return content by custom_id."""
+        client = llm_service._get_openai_client()
+        model_to_use = model if model and model in OPENAI_MODELS else DEFAULT_OPENAI_MODEL
+        
+        lines = [
+            orjson.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model_to_use,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    "temperature": 0.2,
+                    "max_tokens": 4000,
+                },
+            })
+            for i, (system_prompt, user_prompt) in enumerate(requests)
+        ]
+        batch_file = await client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await client.batches.retrieve(batch.id)
+        
+        if not batch.output_file_id:
+            raise RuntimeError(f"OpenAI batch {batch.id} ended with status {batch.status}")
+        
+        output = await client.files.content(batch.output_file_id)
+        outputs = {}
+        for line in output.text.splitlines():
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                outputs[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        return outputs
+    
+    async def _run_anthropic_batch(
+        self,
+        requests: list[tuple[str, str]],
+        model: str | None,
+        poll_interval: float,
+    ) -> dict[str, str]:
+        """Submit (system, user) prompts as an Anthropic message batch; return text by custom_id."""
+        client = llm_service._get_anthropic_client()
+        model_to_use = model if model and model in ANTHROPIC_MODELS else DEFAULT_ANTHROPIC_MODEL
+        
+        batch = await client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": str(i),
+                    "params": {
+                        "model": model_to_use,
+                        "max_tokens": 4000,
+                        "system": cached_system(system_prompt),
+                        "messages": [{"role": "user", "content": user_prompt}],
+                    },
+                }
+                for i, (system_prompt, user_prompt) in enumerate(requests)
+            ],
+        )
+        
+        while batch.processing_status != "ended":
+            await asyncio.sleep(poll_interval)
+            batch = await client.messages.batches.retrieve(batch.id)
+        
+        outputs = {}
+        async for entry in await client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                outputs[entry.custom_id] = entry.result.message.content[0].text
+        return outputs
+    
+    async def _run_stage(
+        self,
+        role: AgentRole,
+        agent: Callable[..., Awaitable[DesignContext]],
+        context: DesignContext,
+        *args,
+        **kwargs,
+    ) -> DesignContext:
+        """Run one agent stage, abandoning it after settings.agent_stage_timeout.
+        
+        Agents record their own errors; a timed-out stage is recorded the same
+        way, and a timed-out validation counts as invalid code.
+        """
+        try:
+            async with asyncio.timeout(settings.agent_stage_timeout):
+                return await agent(context, *args, **kwargs)
+        except TimeoutError:
+            error = f"Timed out after {settings.agent_stage_timeout:g} seconds"
+            if role is AgentRole.VALIDATION:
+                context.validation_result = {"valid": False, "errors": [error], "warnings": []}
+            context.messages.append(AgentMessage(
+                role=role,
+                content=f"Error: {error}",
+                data={"error": error}
+            ))
+            return context
     
     async def _run_design_agent(
         self,
@@ -166,8 +398,6 @@ class AgentService:
         fix_errors: list[str] | None = None,
     ) -> DesignContext:
         """Design Agent: Generate CadQuery code from description/image."""
-        from app.prompts.agent_prompts import DESIGN_AGENT_PROMPT, DESIGN_WITH_IMAGE_PROMPT
-        
         # Build the user prompt
         user_prompt_parts = []
         
@@ -240,51 +470,83 @@ class AgentService:
         provider: str,
         model: str | None,
     ) -> DesignContext:
-        """Validation Agent: Check code for errors and printability."""
-        from app.prompts.agent_prompts import VALIDATION_AGENT_PROMPT
+        """Validation Agent: Check code for errors and printability.
         
+        Static checks run first. Execution and the LLM review only run once
+        they pass: a design retry that still has e.g. a syntax error goes
+        straight back to the design agent without a sandbox round-trip.
+        """
         if not context.code:
             context.validation_result = {"valid": False, "errors": ["No code to validate"]}
             return context
         
-        errors = []
-        warnings = []
-        
         # Step 1: Static validation
-        static_result = code_validator.validate(context.code)
-        if static_result.corrected_code:
-            context.code = static_result.corrected_code
-        errors.extend(static_result.errors)
-        warnings.extend(static_result.warnings)
+        errors, warnings = self._validate_static(context)
         
-        # Step 2: Execute code to validate
-        try:
-            exec_result = await cad_service.execute_code(context.code)
+        if not errors:
+            # Step 2: Execute the code and run the LLM review concurrently
+            exec_result, review_data = await asyncio.gather(
+                self._validate_exec(context),
+                self._validate_llm_review(context.code),
+                return_exceptions=True,
+            )
             
-            if exec_result.success:
-                context.bounding_box = exec_result.bounding_box
-                
-                # Check printability
-                printability = self._check_printability(
-                    exec_result.bounding_box,
-                    context.printer_settings
-                )
-                if not printability["fits"]:
-                    warnings.append(f"Part exceeds build volume: {printability['overflow']}")
-                    
+            if isinstance(exec_result, Exception):
+                errors.append(f"Execution failed: {str(exec_result)}")
             else:
-                errors.append(f"Execution error: {exec_result.error}")
-                
-        except Exception as e:
-            errors.append(f"Execution failed: {str(e)}")
+                exec_errors, exec_warnings = exec_result
+                errors.extend(exec_errors)
+                warnings.extend(exec_warnings)
+            
+            # Step 3: Merge the review findings (non-critical, ignored on failure)
+            if isinstance(review_data, dict):
+                warnings.extend(review_data.get("issues", []))
+                context.optimization_suggestions.extend(review_data.get("suggestions", []))
         
-        # Step 3: LLM-based code review for potential issues
-        if not errors:
-            try:
-                review_prompt = f"""Analyse ce code CadQuery pour détecter des problèmes potentiels:
+        context.validation_result = {
+            "valid": len(errors) == 0,
+            "errors": errors,
+            "warnings": warnings,
+        }
+        
+        context.messages.append(AgentMessage(
+            role=AgentRole.VALIDATION,
+            content="Valid" if not errors else f"Invalid: {len(errors)} errors",
+            data={**context.validation_result}
+        ))
+        
+        return context
+    
+    def _validate_static(self, context: DesignContext) -> tuple[list[str], list[str]]:
+        """Run the static checks, applying any auto-corrections to context.code."""
+        static_result = code_validator.validate(context.code)
+        if static_result.corrected_code:
+            context.code = static_result.corrected_code
+        return list(static_result.errors), list(static_result.warnings)
+    
+    async def _validate_exec(self, context: DesignContext) -> tuple[list[str], list[str]]:
+        """Execute context.code and check the part fits the printer."""
+        exec_result = await cad_service.execute_code(context.code)
+        if not exec_result.success:
+            return [f"Execution error: {exec_result.error}"], []
+        
+        context.bounding_box = exec_result.bounding_box
+        
+        # Check printability
+        printability = self._check_printability(
+            exec_result.bounding_box,
+            context.printer_settings
+        )
+        if not printability["fits"]:
+            return [], [f"Part exceeds build volume: {printability['overflow']}"]
+        return [], []
+    
+    async def _validate_llm_review(self, code: str) -> dict | None:
+        """LLM-based code review for potential issues, as parsed JSON."""
+        review_prompt = f"""Analyse ce code CadQuery pour détecter des problèmes potentiels:
 
 ```python
-{context.code}
+{code}
 ```
 
 Vérifie:
@@ -295,39 +557,17 @@ Vérifie:
 
 Réponds en JSON: {{"issues": [...], "suggestions": [...]}}"""
 
-                # Use fast model for validation analysis (always Anthropic Haiku)
-                fast_provider, fast_model = get_fast_model()
-                review_response = await llm_service.generate_raw(
-                    review_prompt,
-                    VALIDATION_AGENT_PROMPT,
-                    fast_provider,
-                    fast_model,
-                    max_tokens=1000,
-                )
-                
-                # Extract JSON
-                json_match = re.search(r'\{[\s\S]*\}', review_response)
-                if json_match:
-                    review_data = json.loads(json_match.group())
-                    warnings.extend(review_data.get("issues", []))
-                    context.optimization_suggestions.extend(review_data.get("suggestions", []))
-                    
-            except Exception:
-                pass  # Non-critical, continue
-        
-        context.validation_result = {
-            "valid": len(errors) == 0,
-            "errors": errors,
-            "warnings": warnings,
-        }
-        
-        context.messages.append(AgentMessage(
-            role=AgentRole.VALIDATION,
-            content="Valid" if not errors else f"Invalid: {len(errors)} errors",
-            data=context.validation_result
-        ))
+        # Use fast model for validation analysis (always Anthropic Haiku)
+        fast_provider, fast_model = get_fast_model()
+        review_response = await llm_service.generate_raw(
+            review_prompt,
+            VALIDATION_AGENT_PROMPT,
+            fast_provider,
+            fast_model,
+            max_tokens=1000,
+        )
         
-        return context
+        return extract_json(review_response)
     
     async def _run_optimization_agent(
         self,
@@ -336,8 +576,6 @@ Réponds en JSON: {{"issues": [...], "suggestions": [...]}}"""
         model: str | None,
     ) -> DesignContext:
         """Optimization Agent: Improve design for 3D printing."""
-        from app.prompts.agent_prompts import OPTIMIZATION_AGENT_PROMPT
-        
         if not context.code or not context.validation_result.get("valid"):
             return context
         
@@ -384,7 +622,7 @@ Retourne UNIQUEMENT le code Python optimisé."""
                     context.messages.append(AgentMessage(
                         role=AgentRole.OPTIMIZATION,
                         content="Code optimized for 3D printing",
-                        data={"bounding_box": exec_result.bounding_box}
+                        data={"bounding_box": {**exec_result.bounding_box}}
                     ))
                 else:
                     context.messages.append(AgentMessage(
@@ -408,8 +646,21 @@ Retourne UNIQUEMENT le code Python optimisé."""
         provider: str,
         model: str | None,
     ) -> DesignContext:
-        """Review Agent: Compare generated model to original image/intent."""
-        from app.prompts.agent_prompts import REVIEW_AGENT_PROMPT
+        """Review Agent: Compare generated model to original image/intent.
+        
+        Without a reference image there is nothing for a vision model to
+        compare against, so the dimensions are checked locally instead.
+        """
+        
+        if not context.image_data:
+            review_data = self._local_review(context.original_prompt, context.bounding_box)
+            context.messages.append(AgentMessage(
+                role=AgentRole.REVIEW,
+                content=f"Score: {review_data['score']}/10 (local)",
+                data={**review_data}
+            ))
+            context.optimization_suggestions.extend(review_data["suggestions"])
+            return context
         
         # This would ideally render the 3D model and compare with the input image
         # For now, we do a description-based comparison
@@ -432,33 +683,22 @@ Réponds en JSON: {{"score": X, "matches": true/false, "differences": [...], "su
             # Use fast model for review analysis (always Anthropic Haiku)
             fast_provider, fast_model = get_fast_model()
             
-            if context.image_data:
-                # Use vision to compare with original image
-                review_response = await self._generate_with_vision(
-                    review_prompt + "\n\nCompare également avec l'image de référence fournie.",
-                    REVIEW_AGENT_PROMPT,
-                    context.image_data,
-                    context.image_mime_type,
-                    fast_provider,
-                    fast_model,
-                )
-            else:
-                review_response = await llm_service.generate_raw(
-                    review_prompt,
-                    REVIEW_AGENT_PROMPT,
-                    fast_provider,
-                    fast_model,
-                    max_tokens=1000,
-                )
+            # Use vision to compare with original image
+            review_response = await self._generate_with_vision(
+                review_prompt + "\n\nCompare également avec l'image de référence fournie.",
+                REVIEW_AGENT_PROMPT,
+                context.image_data,
+                context.image_mime_type,
+                fast_provider,
+                fast_model,
+            )
             
-            # Extract JSON
-            json_match = re.search(r'\{[\s\S]*\}', review_response)
-            if json_match:
-                review_data = json.loads(json_match.group())
+            review_data = extract_json(review_response)
+            if review_data:
                 context.messages.append(AgentMessage(
                     role=AgentRole.REVIEW,
                     content=f"Score: {review_data.get('score', 'N/A')}/10",
-                    data=review_data
+                    data={**review_data}
                 ))
                 
                 # Add any new suggestions
@@ -473,34 +713,80 @@ Réponds en JSON: {{"score": X, "matches": true/false, "differences": [...], "su
         
         return context
     
+    def _local_review(self, prompt: str, bbox: dict | None) -> dict:
+        """Score the model's bounding box against dimensions named in the prompt.
+        
+        Only scored when the prompt names exactly one value per extent, i.e.
+        the overall dimensions; otherwise some values are features (holes,
+        walls) the bounding box can't show. Each value is matched to the
+        closest remaining extent and the worst relative error maps to a 1-10
+        score. Returns the same shape as the LLM review JSON.
+        """
+        requested = [float(value.replace(",", ".")) for value in _DIM_RE.findall(prompt)]
+        extents = [bbox.get(axis, 0) for axis in ("x", "y", "z")] if bbox else []
+        
+        if not any(extents) or len(requested) != len(extents):
+            return {
+                "score": "N/A",
+                "matches": True,
+                "differences": [],
+                "suggestions": [],
+            }
+        
+        remaining = list(extents)
+        differences = []
+        max_err = 0.0
+        for target in sorted(requested, reverse=True):
+            if not target:
+                continue
+            actual = min(remaining, key=lambda extent: abs(extent - target))
+            remaining.remove(actual)
+            err = abs(actual - target) / target
+            max_err = max(max_err, err)
+            if err > 0.05:
+                differences.append(f"{target:g}mm demandé, {actual:.1f}mm obtenu")
+        
+        score = max(1, 10 - round(max_err * 10))
+        return {
+            "score": score,
+            "matches": not differences,
+            "differences": differences,
+            "suggestions": [f"Vérifier la dimension: {d}" for d in differences],
+        }
+    
     async def _generate_with_vision(
         self,
         user_prompt: str,
         system_prompt: str,
-        image_data: str | list[tuple[str, str]],
+        image_data: str | bytes | list[tuple[str | bytes, str]],
         image_mime_type: str | None,
         provider: str,
         model: str | None,
     ) -> str:
         """Generate response using vision-capable models.
         
+        Responses are streamed and the stream is closed as soon as the
+        ```python block is complete, skipping any trailing explanation.
+        
         Args:
-            image_data: Either a single base64 string, or a list of (data, mime_type) tuples
+            image_data: Either a single image, or a list of (data, mime_type) tuples.
+                Raw bytes are base64-encoded here, when the payload is built.
         """
-        import openai
-        import anthropic
-        
-        # Normalize to list of (data, mime_type) tuples
-        if isinstance(image_data, str):
-            images = [(image_data, image_mime_type or "image/jpeg")]
-        else:
-            images = image_data
+        # Normalize to list of (base64, mime_type) tuples
+        if isinstance(image_data, (str, bytes)):
+            image_data = [(image_data, image_mime_type or "image/jpeg")]
+        images = [
+            (base64.b64encode(data).decode("ascii") if isinstance(data, bytes) else data, mime_type)
+            for data, mime_type in image_data
+        ]
         
         if provider == "openai":
-            client = openai.AsyncOpenAI(api_key=settings.openai_api_key)
+            client = llm_service._get_openai_client()
             
-            # Build content with multiple images
-            content_parts = [{"type": "text", "text": user_prompt}]
+            # Build content with multiple images. Images go before the text so
+            # the system prompt + images prefix is identical across retries and
+            # picked up by OpenAI's automatic prompt caching.
+            content_parts = []
             for data, mime_type in images:
                 content_parts.append({
                     "type": "image_url",
@@ -508,8 +794,9 @@ Réponds en JSON: {{"score": X, "matches": true/false, "differences": [...], "su
                         "url": f"data:{mime_type};base64,{data}"
                     }
                 })
+            content_parts.append({"type": "text", "text": user_prompt})
             
-            response = await client.chat.completions.create(
+            stream = await client.chat.completions.create(
                 model=model or "gpt-4o",  # Vision-capable model
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -517,11 +804,22 @@ Réponds en JSON: {{"score": X, "matches": true/false, "differences": [...], "su
                 ],
                 max_tokens=4000,
                 temperature=0.2,
+                stream=True,
             )
-            content = response.choices[0].message.content
+            chunks = []
+            try:
+                async for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        chunks.append(text)
+                        if "`" in text and self._code_block_closed("".join(chunks)):
+                            break
+            finally:
+                await stream.close()
+            content = "".join(chunks)
             
         elif provider == "anthropic":
-            client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+            client = llm_service._get_anthropic_client()
             
             # Build content with multiple images (images first, then text)
             content_parts = []
@@ -534,20 +832,96 @@ Réponds en JSON: {{"score": X, "matches": true/false, "differences": [...], "su
                         "data": data,
                     }
                 })
+            # Cache system prompt + images across design retries and review
+            content_parts[-1]["cache_control"] = CACHE_CONTROL
             content_parts.append({"type": "text", "text": user_prompt})
             
-            response = await client.messages.create(
+            chunks = []
+            async with client.messages.stream(
                 model=model or "claude-sonnet-4-5-20250929",
                 max_tokens=4000,
-                system=system_prompt,
+                system=cached_system(system_prompt),
                 messages=[{"role": "user", "content": content_parts}],
-            )
-            content = response.content[0].text
+            ) as stream:
+                async for text in stream.text_stream:
+                    chunks.append(text)
+                    if "`" in text and self._code_block_closed("".join(chunks)):
+                        break
+            content = "".join(chunks)
         else:
             raise ValueError(f"Unknown provider: {provider}")
         
         return self._extract_code(content) or content
     
+    async def _preprocess_images_async(
+        self,
+        images: list[tuple[str | bytes, str]],
+        provider: str,
+    ) -> list[tuple[bytes, str]]:
+        """Run _preprocess_images in a worker thread; decoding and JPEG encoding are CPU-bound."""
+        return await asyncio.to_thread(self._preprocess_images, images, provider)
+    
+    def _preprocess_images(
+        self,
+        images: list[tuple[str | bytes, str]],
+        provider: str,
+    ) -> list[tuple[bytes, str]]:
+        """Down-scale and re-encode images to the provider's vision limits.
+        
+        Each image is resized so its long edge fits the provider (1568px for
+        Anthropic, a 512px tile multiple up to 2048px for OpenAI) and
+        re-encoded as JPEG. Images that fail to decode, or would not get
+        smaller, are passed through unchanged. Images come back as raw bytes;
+        base64 is only applied when a request payload is built.
+        """
+        if provider == "openai":
+            max_edge = OPENAI_IMAGE_MAX_EDGE
+        else:
+            max_edge = ANTHROPIC_IMAGE_MAX_EDGE
+        
+        processed = []
+        # One output buffer is reused for every image in the batch
+        buffer = io.BytesIO()
+        for data, mime_type in images:
+            raw = base64.b64decode(data) if isinstance(data, str) else data
+            try:
+                image = Image.open(io.BytesIO(raw))
+                image.load()
+            except Exception:
+                processed.append((raw, mime_type))
+                continue
+        
+            long_edge = max(image.size)
+            target = min(long_edge, max_edge)
+            if provider == "openai" and target >= OPENAI_IMAGE_TILE:
+                target -= target % OPENAI_IMAGE_TILE
+            if target < long_edge:
+                scale = target / long_edge
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(size, Image.Resampling.LANCZOS)
+        
+            if image.mode != "RGB":
+                # Flatten transparency onto white, as drawings usually assume
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                rgba = image.convert("RGBA")
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                image = background
+        
+            buffer.seek(0)
+            buffer.truncate(0)
+            image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+            if buffer.tell() < len(raw):
+                processed.append((buffer.getvalue(), "image/jpeg"))
+            else:
+                processed.append((raw, mime_type))
+        
+        return processed
+    
+    def _code_block_closed(self, content: str) -> bool:
+        """Check whether a streamed response has completed its ```python block."""
+        start = content.find("```python")
+        return start != -1 and content.find("```", start + len("```python")) != -1
+    
     def _extract_code(self, content: str) -> str | None:
         """Extract Python code from response."""
         if "```python" in content:
@@ -1,17 +1,308 @@
 import os
+import ast
 import asyncio
-import tempfile
+import ctypes
+import hashlib
+import orjson
+import shutil
+import signal
+import struct
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any
 
 from app.config import settings
 
 
-@dataclass
+# Standalone worker script run by the sandbox pool, and its frame header
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "cad_worker.py")
+FRAME_HEADER = struct.Struct(">I")
+# Packed reply for a measured bbox: tag byte, then x/y/z as float64
+BBOX_REPLY = struct.Struct("<Bddd")
+BBOX_TAG = 0x01
+READY = b"\x01"  # Sent once by a worker after its imports and warm-up
+# Seconds an interrupted job gets to answer before its worker is replaced
+CANCEL_GRACE = 2.0
+# Seconds a new worker gets to import CadQuery and warm up
+START_TIMEOUT = 60.0
+# Pipe read buffer, sized so STL attachments arrive in few large chunks
+PIPE_LIMIT = 2 ** 20
+
+
+@dataclass(slots=True, frozen=True)
 class ExecutionResult:
     success: bool
     bounding_box: dict[str, float] | None = None
     error: str | None = None
+    stl: bytes | None = None  # Only for in-memory STL exports
+    results: list["ExecutionResult"] | None = None  # Only for batch jobs, one per code
+
+
+# Top-level modules user code may import: CadQuery, its extension libraries
+# and side-effect-free stdlib helpers
+ALLOWED_MODULES = frozenset({
+    "cadquery", "OCP", "cq_gears", "cq_gridfinity", "cq_warehouse", "cqkit",
+    "numpy", "math", "cmath", "random", "itertools", "functools", "operator",
+    "collections", "dataclasses", "enum", "typing", "copy", "fractions", "decimal",
+})
+# Builtins that reach modules, namespaces or attributes by name, around the
+# import allowlist; dunder names and attributes are blocked wholesale
+BLOCKED_NAMES = frozenset({
+    "exec", "eval", "compile", "open", "breakpoint", "getattr", "setattr",
+    "delattr", "globals", "locals", "vars",
+})
+
+
+def _is_dunder(name: str) -> bool:
+    return len(name) > 4 and name.startswith("__") and name.endswith("__")
+
+
+def _bbox_dict(x: float, y: float, z: float) -> dict[str, float]:
+    """Bounding box lengths as reported to callers (rounded to 3 decimals)."""
+    return {"x": round(x, 3), "y": round(y, 3), "z": round(z, 3)}
+
+
+# Returned when no runner frees up within the job's timeout
+_BUSY_RESULT = ExecutionResult(success=False, error="CAD sandbox is busy, please retry")
+
+
+@lru_cache(maxsize=8)
+def _timeout_result(timeout: float) -> ExecutionResult:
+    """Timed-out result, shared per timeout value since results are immutable."""
+    return ExecutionResult(success=False, error=f"Execution timed out after {timeout} seconds")
+
+
+class WorkerCrashedError(Exception):
+    """A sandbox worker exited while running a job."""
+
+
+class SandboxBusyError(Exception):
+    """No sandbox worker became free before the job's deadline."""
+
+
+class _InProcessTimeout(BaseException):
+    """Raised inside a trusted job's thread when it overruns the timeout."""
+
+
+def _raise_in_thread(thread_id: int, exc_type: type[BaseException]) -> None:
+    """Ask the interpreter to raise exc_type in another thread.
+    
+    The exception is delivered at the thread's next bytecode, so a job stuck
+    inside a single long OCCT call only stops once that call returns.
+    """
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exc_type)
+    )
+
+
+class _SandboxWorker:
+    """A long-lived worker process speaking the cad_worker framing protocol."""
+    
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+    
+    @classmethod
+    async def start(cls) -> "_SandboxWorker":
+        # -I: isolated mode, so neither PYTHON* variables nor the worker's own
+        # directory (the app's services package) end up on the sandbox's path.
+        # A new session makes the worker a process group leader, so kill()
+        # also takes down anything user code managed to spawn
+        process = await asyncio.create_subprocess_exec(
+            'python', '-I', WORKER_SCRIPT, str(settings.cad_worker_memory_mb),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=PIPE_LIMIT,
+            start_new_session=True,
+        )
+        worker = cls(process)
+        # Only hand out workers that have finished importing CadQuery
+        try:
+            async with asyncio.timeout(START_TIMEOUT):
+                ready = await worker._read_frame()
+        except asyncio.IncompleteReadError:
+            ready = None  # Exited during startup, e.g. a failed import
+        except asyncio.TimeoutError:
+            worker.kill()
+            raise WorkerCrashedError("Sandbox worker did not start in time") from None
+        except BaseException:
+            worker.kill()
+            raise
+        if ready != READY:
+            worker.kill()
+            raise WorkerCrashedError("Sandbox worker failed to start")
+        return worker
+    
+    async def run(self, payload: bytes) -> tuple[bytes, bytes]:
+        """Send one job and return the worker's reply and attachment frames."""
+        try:
+            self.process.stdin.write(FRAME_HEADER.pack(len(payload)) + payload)
+            await self.process.stdin.drain()
+            return await self._read_frame(), await self._read_frame()
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+            raise WorkerCrashedError("Sandbox worker crashed during execution")
+    
+    async def _read_frame(self) -> bytes:
+        header = await self.process.stdout.readexactly(FRAME_HEADER.size)
+        return await self.process.stdout.readexactly(FRAME_HEADER.unpack(header)[0])
+    
+    def interrupt(self) -> None:
+        """Abort the running job (the worker replies "Cancelled" and stays up)."""
+        try:
+            os.kill(self.process.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+    
+    def kill(self) -> None:
+        # The whole group, even if the worker itself already exited
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class SandboxPool:
+    """Pool of warm sandbox workers that have already imported CadQuery.
+    
+    Each call borrows an idle worker. A worker that times out or crashes is
+    killed and replaced, so state never leaks from a broken job. A job whose
+    caller is cancelled is interrupted instead, and its worker goes back to
+    the pool once it has answered.
+    
+    The pool keeps `size` workers warm and grows on demand up to `max_size`
+    when every worker is busy; surplus workers are retired as soon as the
+    idle pool is back to `size`.
+    """
+    
+    def __init__(self, size: int, timeout: float, max_size: int | None = None):
+        self.size = size
+        self.max_size = max(size, max_size or size)
+        self.timeout = timeout
+        self._idle: asyncio.Queue[_SandboxWorker] | None = None
+        self._start_lock = asyncio.Lock()
+        self._total = 0  # Workers alive, busy or idle
+        self._background: set[asyncio.Task] = set()  # Recoveries and restarts
+    
+    async def _ensure_started(self) -> asyncio.Queue:
+        async with self._start_lock:
+            if self._idle is None:
+                idle = asyncio.Queue()
+                started = await asyncio.gather(
+                    *(_SandboxWorker.start() for _ in range(self.size)), return_exceptions=True
+                )
+                errors = [w for w in started if isinstance(w, BaseException)]
+                if errors:
+                    # Don't leave the workers that did boot running untracked
+                    for worker in started:
+                        if not isinstance(worker, BaseException):
+                            worker.kill()
+                    raise errors[0]
+                for worker in started:
+                    idle.put_nowait(worker)
+                self._total = self.size
+                self._idle = idle
+        return self._idle
+    
+    async def _acquire(self, idle: asyncio.Queue) -> _SandboxWorker:
+        if idle.empty() and self._total < self.max_size:
+            # Every worker is busy: grow rather than queue behind them
+            self._total += 1
+            try:
+                return await _SandboxWorker.start()
+            except BaseException:
+                self._total -= 1
+                raise
+        return await idle.get()
+    
+    def _release(self, idle: asyncio.Queue, worker: _SandboxWorker) -> None:
+        if self._total > self.size and idle.qsize() >= self.size:
+            worker.kill()
+            self._total -= 1
+        else:
+            idle.put_nowait(worker)
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    def _discard(self, idle: asyncio.Queue, worker: _SandboxWorker) -> None:
+        worker.kill()
+        if self._total > self.size or self._idle is not idle:
+            # Surplus worker, or the pool has been closed meanwhile
+            self._total -= 1
+        else:
+            # Booted in the background so the failed call returns at once
+            self._spawn(self._replace(idle))
+    
+    async def _replace(self, idle: asyncio.Queue) -> None:
+        try:
+            worker = await _SandboxWorker.start()
+        except Exception:
+            # Give the slot back so _acquire can start a worker later,
+            # instead of leaving the pool one worker short for good
+            self._total -= 1
+            return
+        if self._idle is idle:
+            idle.put_nowait(worker)
+        else:
+            worker.kill()  # Closed while the worker was booting
+    
+    async def _recover(self, idle: asyncio.Queue, worker: _SandboxWorker, job: asyncio.Future) -> None:
+        """Wait for an interrupted job's reply, then recycle its worker."""
+        try:
+            async with asyncio.timeout(CANCEL_GRACE):
+                await job
+        except BaseException:
+            # Stuck in a long OCCT call, or crashed
+            job.cancel()
+            self._discard(idle, worker)
+        else:
+            self._release(idle, worker)
+    
+    async def submit(self, payload: bytes, timeout: float | None = None) -> tuple[bytes, bytes]:
+        """Run a job on a worker and return its reply and attachment."""
+        idle = await self._ensure_started()
+        # One deadline for waiting on a free worker and running the job
+        deadline = asyncio.get_running_loop().time() + (timeout or self.timeout)
+        try:
+            async with asyncio.timeout_at(deadline):
+                worker = await self._acquire(idle)
+        except asyncio.TimeoutError:
+            raise SandboxBusyError("No sandbox worker became free in time") from None
+        # Shielded so a cancelled caller can't stop reading mid-frame and
+        # leave the worker's stream out of sync
+        job = asyncio.ensure_future(worker.run(payload))
+        try:
+            async with asyncio.timeout_at(deadline):
+                reply = await asyncio.shield(job)
+        except asyncio.CancelledError:
+            # The caller went away (e.g. the client disconnected): stop the
+            # job rather than let it run to completion, but keep the worker
+            worker.interrupt()
+            self._spawn(self._recover(idle, worker, job))
+            raise
+        except BaseException:
+            # Timed out or crashed mid-job: the worker is unusable
+            job.cancel()
+            self._discard(idle, worker)
+            raise
+        self._release(idle, worker)
+        return reply
+    
+    async def close(self) -> None:
+        if self._idle is None:
+            return
+        idle, self._idle = self._idle, None
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        while not idle.empty():
+            worker = idle.get_nowait()
+            worker.kill()
+            await worker.process.wait()
+        self._total = 0
 
 
 class CadService:
@@ -19,164 +310,335 @@ class CadService:
     
     def __init__(self):
         self.timeout = 30  # seconds
+        # Serializes trusted calls, which run in this process (see execute_code)
+        self._inproc_sem = asyncio.Semaphore(1)
+        # Warm workers; 0 falls back to a fresh single-use worker per call
+        self.pool = SandboxPool(
+            settings.cad_worker_pool_size, self.timeout, settings.cad_worker_pool_max
+        ) if settings.cad_worker_pool_size else None
+        # LRU of successful runs keyed by code digest (and STL path for exports)
+        self._cache: OrderedDict[str, ExecutionResult] = OrderedDict()
+        self._cache_cap = settings.cad_result_cache_size
+        self._stl_dir: str | None = None
+        # Current STL file per part; the previous one is removed on re-export
+        self._stl_files: dict[str, str] = {}
+        # Static check verdicts by code digest (None = allowed)
+        self._checked: OrderedDict[str, str | None] = OrderedDict()
+    
+    def _cache_key(self, code: str, suffix: str = "") -> str:
+        return hashlib.blake2b(code.encode(), digest_size=16).hexdigest() + suffix
     
-    async def execute_code(self, code: str) -> ExecutionResult:
-        """Execute CadQuery code and return the bounding box."""
-        # Create execution script that captures the result
-        execution_script = f'''
-import sys
-import json
-
-# Execute the user code with extended library support
-try:
-    import cadquery as cq
-    import math
-    import numpy as np
-    
-    # CadQuery extension libraries (imported on demand based on code)
-    # cq-warehouse: fasteners, bearings, threads
-    # cq_gears: gear generation
-    # cq-gridfinity: gridfinity bins
-    # cq-kit: utilities
-    
-    # User code
-{self._indent_code(code, 4)}
-    
-    # Get bounding box - handle both Workplane and Shape objects
-    if hasattr(result, 'val'):
-        shape = result.val()
-    elif hasattr(result, 'wrapped'):
-        shape = result.wrapped
-    elif hasattr(result, 'BoundingBox'):
-        shape = result
-    else:
-        # Try to get shape from build() if it's a library object
-        if hasattr(result, 'build'):
-            built = result.build()
-            shape = built.val() if hasattr(built, 'val') else built
+    def _cache_get(self, key: str) -> ExecutionResult | None:
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+        return result
+    
+    def _cache_put(self, key: str, result: ExecutionResult) -> None:
+        # Only successes are cached; errors may be timeouts or crashes
+        if not result.success:
+            return
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_cap:
+            self._cache.popitem(last=False)
+    
+    def clear_cache(self) -> None:
+        """Forget all cached execution results."""
+        self._cache.clear()
+        self._checked.clear()
+    
+    def _validate(self, code: str) -> str | None:
+        """Reject code that doesn't parse or reaches outside the module allowlist.
+        
+        A fast-fail check so obviously out-of-scope code gets a clear error
+        before a worker is tied up; the worker process is the security
+        boundary, not this. Returns the error message, or None if the code
+        may run. Verdicts are cached, so the same code is only parsed once.
+        """
+        key = self._cache_key(code)
+        if key in self._checked:
+            self._checked.move_to_end(key)
+            return self._checked[key]
+        
+        error = None
+        try:
+            tree = ast.parse(code, "<cad>")
+        except SyntaxError as e:
+            error = str(e)
         else:
-            shape = result
-    
-    bbox = shape.BoundingBox()
-    output = {{
-        "success": True,
-        "bounding_box": {{
-            "x": round(bbox.xlen, 3),
-            "y": round(bbox.ylen, 3),
-            "z": round(bbox.zlen, 3)
-        }}
-    }}
-    print(json.dumps(output))
-except Exception as e:
-    import traceback
-    output = {{
-        "success": False,
-        "error": str(e),
-        "traceback": traceback.format_exc()
-    }}
-    print(json.dumps(output))
-'''
-        
-        return await self._run_sandboxed(execution_script)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    modules = [alias.name for alias in node.names]
+                elif isinstance(node, ast.ImportFrom):
+                    modules = [node.module or "." * node.level]
+                elif isinstance(node, ast.Name) and (node.id in BLOCKED_NAMES or _is_dunder(node.id)):
+                    error = f"Disallowed: use of '{node.id}'"
+                    break
+                elif isinstance(node, ast.Attribute) and _is_dunder(node.attr):
+                    error = f"Disallowed: access to '{node.attr}'"
+                    break
+                else:
+                    continue
+                blocked = [m for m in modules if m.split(".")[0] not in ALLOWED_MODULES]
+                if blocked:
+                    error = f"Disallowed: import of '{blocked[0]}'"
+                    break
+        
+        self._checked[key] = error
+        if len(self._checked) > self._cache_cap:
+            self._checked.popitem(last=False)
+        return error
+    
+    async def execute_code(self, code: str, trusted: bool = False) -> ExecutionResult:
+        """Execute CadQuery code and return the bounding box.
+        
+        Successful results are cached by code, so re-validating unchanged
+        code returns immediately.
+        
+        trusted=True measures the code in this process, skipping the worker
+        round-trip. Only for code the app wrote itself: it shares the app's
+        memory and globals, and the static check is not a sandbox.
+        """
+        return (await self.execute_codes([code], trusted))[0]
+    
+    async def execute_codes(self, codes: list[str], trusted: bool = False) -> list[ExecutionResult]:
+        """Execute several CadQuery codes and return their bounding boxes in order.
+        
+        Codes that are neither cached nor rejected by the static check are
+        measured together in a single worker job (see execute_code for trusted).
+        """
+        results: list[ExecutionResult | None] = []
+        pending: dict[str, list[int]] = {}  # Code -> positions; duplicates run once
+        for i, code in enumerate(codes):
+            result = self._cache_get(self._cache_key(code))
+            if result is None:
+                error = self._validate(code)
+                if error:
+                    result = ExecutionResult(success=False, error=error)
+                else:
+                    pending.setdefault(code, []).append(i)
+            results.append(result)
+        
+        if pending:
+            measured = await self._measure(list(pending), trusted)
+            for (code, positions), result in zip(pending.items(), measured):
+                self._cache_put(self._cache_key(code), result)
+                for i in positions:
+                    results[i] = result
+        return results
+    
+    async def _measure(self, codes: list[str], trusted: bool = False) -> list[ExecutionResult]:
+        if trusted:
+            # Bounded wait: a job stuck inside OCCT never releases the slot
+            try:
+                async with asyncio.timeout(self.timeout):
+                    await self._inproc_sem.acquire()
+            except asyncio.TimeoutError:
+                return [_BUSY_RESULT] * len(codes)
+            try:
+                return [await asyncio.to_thread(self._exec_inproc, code) for code in codes]
+            finally:
+                self._inproc_sem.release()
+        
+        if len(codes) == 1:
+            return [await self._run_sandboxed({"op": "bbox", "code": codes[0]})]
+        
+        # One round-trip for the whole batch, with a timeout to match its size
+        batch = await self._run_sandboxed(
+            {"op": "bbox_batch", "codes": codes}, timeout=self.timeout * len(codes)
+        )
+        return batch.results if batch.success else [batch] * len(codes)
     
     async def generate_stl(self, code: str, part_id: str) -> str:
-        """Generate STL file from CadQuery code."""
-        os.makedirs(settings.temp_dir, exist_ok=True)
-        stl_path = os.path.join(settings.temp_dir, f"{part_id}.stl")
-        
-        execution_script = f'''
-import sys
-import json
-
-try:
-    import cadquery as cq
-    from cadquery import exporters
-    import math
-    import numpy as np
-    
-    # User code
-{self._indent_code(code, 4)}
-    
-    # Handle different result types from libraries
-    export_shape = result
-    if hasattr(result, 'build'):
-        # Library objects like cq_gears.SpurGear need to call build()
-        export_shape = result.build()
-    
-    # Export to STL
-    exporters.export(export_shape, "{stl_path}")
-    
-    output = {{"success": True, "path": "{stl_path}"}}
-    print(json.dumps(output))
-except Exception as e:
-    import traceback
-    output = {{"success": False, "error": str(e), "traceback": traceback.format_exc()}}
-    print(json.dumps(output))
-'''
-        
-        result = await self._run_sandboxed(execution_script)
+        """Generate STL file from CadQuery code.
+        
+        Routers should serve the returned path with FileResponse, which
+        streams it in chunks, rather than reading the file into memory.
+        """
+        # Named after the code digest, so a path only ever holds one code's
+        # mesh and re-exporting an older version can't pick up a newer file
+        digest = self._cache_key(code)
+        stl_path = os.path.join(self._stl_output_dir(), f"{part_id}-{digest}.stl")
+        
+        # Reuse the file if this exact code was already exported there
+        key = f"{digest}:stl:{stl_path}"
+        if self._cache_get(key) is not None and os.path.exists(stl_path):
+            return stl_path
+        
+        error = self._validate(code)
+        if error:
+            raise Exception(error)
+        
+        result = await self._run_sandboxed({"op": "stl", "code": code, "stl_path": stl_path})
         
         if not result.success:
             raise Exception(result.error or "Failed to generate STL")
         
+        self._cache_put(key, result)
+        # One file per part, as when the path didn't carry the digest
+        previous = self._stl_files.get(part_id)
+        self._stl_files[part_id] = stl_path
+        if previous and previous != stl_path:
+            try:
+                os.unlink(previous)
+            except FileNotFoundError:
+                pass
         return stl_path
     
-    async def _run_sandboxed(self, script: str) -> ExecutionResult:
-        """Run script in subprocess with timeout."""
-        import json
+    def _stl_output_dir(self) -> str:
+        """Per-process STL directory, so app processes never write the same file."""
+        # Checked by pid rather than fixed at import, in case the app forks
+        path = os.path.join(settings.temp_dir, "stl", str(os.getpid()))
+        if path != self._stl_dir:
+            os.makedirs(path, exist_ok=True)
+            self._stl_dir = path
+        return path
+    
+    @staticmethod
+    def _sweep_stl_dirs() -> None:
+        """Remove STL directories left behind by app processes that have exited."""
+        root = os.path.join(settings.temp_dir, "stl")
+        try:
+            entries = os.listdir(root)
+        except FileNotFoundError:
+            return
+        for name in entries:
+            if not name.isdigit() or int(name) == os.getpid():
+                continue
+            try:
+                os.kill(int(name), 0)
+            except ProcessLookupError:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            except PermissionError:
+                pass  # Alive, owned by another user
+    
+    async def generate_stl_bytes(self, code: str) -> bytes:
+        """Generate an STL from CadQuery code and return it without writing to temp_dir.
+        
+        The whole mesh is held in memory, so this suits previews of typical
+        parts; use generate_stl for downloads of arbitrarily large meshes.
+        """
+        error = self._validate(code)
+        if error:
+            raise Exception(error)
+        
+        result = await self._run_sandboxed({"op": "stl_bytes", "code": code})
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(script)
-            script_path = f.name
+        if not result.success:
+            raise Exception(result.error or "Failed to generate STL")
+        
+        return result.stl
+    
+    def _exec_inproc(self, code: str) -> ExecutionResult:
+        """Measure code on the calling thread, interrupted after self.timeout."""
+        # Imported lazily so CadQuery is only loaded here by trusted calls
+        from app.services import cad_worker
         
+        thread_id = threading.get_ident()
+        state = threading.Lock()
+        finished = False
+        
+        def interrupt() -> None:
+            with state:
+                if not finished:
+                    _raise_in_thread(thread_id, _InProcessTimeout)
+        
+        watchdog = threading.Timer(self.timeout, interrupt)
+        watchdog.start()
         try:
-            process = await asyncio.create_subprocess_exec(
-                'python', script_path,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=self.timeout
-                )
+                reply, _ = cad_worker._run_job({"op": "bbox", "code": code})
+            finally:
+                with state:
+                    finished = True
+                watchdog.cancel()
+        except _InProcessTimeout:
+            return _timeout_result(self.timeout)
+        except BaseException as e:
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            # Covers sys.exit() in user code as well as ordinary errors
+            return ExecutionResult(success=False, error=str(e) or type(e).__name__)
+        
+        return ExecutionResult(success=True, bounding_box=_bbox_dict(**reply["bounding_box"]))
+    
+    async def _run_sandboxed(self, job: dict, timeout: float | None = None) -> ExecutionResult:
+        """Run a job on a sandbox worker (or a one-off worker) with timeout."""
+        timeout = timeout or self.timeout
+        # CPU backstop enforced by the worker's kernel limit, should a job
+        # outlive our own timeout (e.g. stuck inside OCCT while we're stalled)
+        payload = orjson.dumps({**job, "cpu_limit": timeout + 1})
+        if self.pool:
+            try:
+                reply, attachment = await self.pool.submit(payload, timeout)
             except asyncio.TimeoutError:
-                process.kill()
+                return _timeout_result(timeout)
+            except SandboxBusyError:
+                return _BUSY_RESULT
+            except WorkerCrashedError as e:
+                return ExecutionResult(success=False, error=str(e))
+            return self._parse_output(reply, attachment)
+        
+        return await self._run_subprocess(payload, timeout)
+    
+    async def _run_subprocess(self, payload: bytes, timeout: float) -> ExecutionResult:
+        """Run a job on a fresh, single-use worker with timeout."""
+        worker = None
+        try:
+            worker = await _SandboxWorker.start()
+            async with asyncio.timeout(timeout):
+                reply, attachment = await worker.run(payload)
+        except asyncio.TimeoutError:
+            return _timeout_result(timeout)
+        except WorkerCrashedError as e:
+            return ExecutionResult(success=False, error=str(e))
+        finally:
+            if worker:
+                worker.kill()
+                await worker.process.wait()
+        
+        return self._parse_output(reply, attachment)
+    
+    def _parse_output(self, reply: bytes, attachment: bytes = b"") -> ExecutionResult:
+        """Parse the reply (and any STL attachment) sent back by a worker."""
+        if len(reply) == BBOX_REPLY.size and reply[0] == BBOX_TAG:
+            _, x, y, z = BBOX_REPLY.unpack(reply)
+            return ExecutionResult(success=True, bounding_box=_bbox_dict(x, y, z))
+        
+        try:
+            output = orjson.loads(reply)
+            if output.get("success"):
                 return ExecutionResult(
-                    success=False,
-                    error=f"Execution timed out after {self.timeout} seconds"
+                    success=True,
+                    stl=attachment or None,
+                    results=[
+                        ExecutionResult(success=True, bounding_box=_bbox_dict(**item["bounding_box"]))
+                        if item["success"] else ExecutionResult(success=False, error=item["error"])
+                        for item in output["results"]
+                    ] if "results" in output else None,
                 )
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode() if stderr else "Unknown error"
-                return ExecutionResult(success=False, error=error_msg)
-            
-            try:
-                output = json.loads(stdout.decode())
-                if output.get("success"):
-                    return ExecutionResult(
-                        success=True,
-                        bounding_box=output.get("bounding_box")
-                    )
-                else:
-                    return ExecutionResult(
-                        success=False,
-                        error=output.get("error", "Unknown error")
-                    )
-            except json.JSONDecodeError:
+            else:
                 return ExecutionResult(
                     success=False,
-                    error=f"Invalid output: {stdout.decode()}"
+                    error=output.get("error", "Unknown error")
                 )
-        finally:
-            os.unlink(script_path)
+        except orjson.JSONDecodeError:
+            return ExecutionResult(
+                success=False,
+                error=f"Invalid output: {reply.decode(errors='replace')}"
+            )
+    
+    async def start(self) -> None:
+        """Warm the sandbox ahead of the first job."""
+        await asyncio.to_thread(self._sweep_stl_dirs)
+        if self.pool:
+            await self.pool._ensure_started()
     
-    def _indent_code(self, code: str, spaces: int) -> str:
-        """Indent code block."""
-        indent = ' ' * spaces
-        lines = code.split('\n')
-        return '\n'.join(indent + line for line in lines)
+    async def close(self) -> None:
+        """Stop the sandbox workers."""
+        if self.pool:
+            await self.pool.close()
 
 
 cad_service = CadService()
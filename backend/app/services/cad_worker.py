@@ -0,0 +1,272 @@
+"""
+Long-lived CadQuery sandbox worker.
+
+Started by CadService as a standalone script (it does not import the app).
+For trusted calls CadService imports this module instead and calls _run_job
+in-process; the channel is only claimed when run as a script.
+CadQuery and its helpers are imported once at boot. Each job carries the user
+code as data; it runs in a fresh namespace pre-seeded with those imports, and
+the worker then measures or exports the `result` it defines.
+
+Jobs:    {"op": "bbox" | "stl" | "stl_bytes", "code": str, "stl_path": str (stl only)}
+         {"op": "bbox_batch", "codes": [str, ...]}
+         Any job may carry "cpu_limit": CPU seconds it may use before the
+         kernel kills the worker (RLIMIT_CPU)
+Replies: {"success": bool, "path": str, "results": [...], "error": str}, or for
+         a measured bbox the packed BBOX_REPLY (tag byte 0x01, then x/y/z
+         lengths as little-endian float64); either is followed by an
+         attachment frame: the STL for stl_bytes, else empty
+
+Framing (both directions): 4-byte big-endian length followed by the payload.
+Once warmed up, the worker sends a single READY frame before taking jobs.
+SIGINT cancels the running job, which then replies with error "Cancelled";
+between jobs it is ignored.
+Frames travel over private duplicates of stdin/stdout taken at startup; fd 0
+and fd 1 themselves are repointed, so neither user code nor C-level library
+output can read from or write into the channel.
+"""
+import contextlib
+import hashlib
+import io
+import math
+import os
+import resource
+import signal
+import struct
+import sys
+import tempfile
+from collections import OrderedDict
+from types import CodeType
+
+import orjson
+
+if __name__ == "__main__":
+    # Claim the channel before anything else can touch fds 0/1: OCCT writes
+    # some messages straight to fd 1, and user code could call input()
+    CHANNEL_IN = os.fdopen(os.dup(0), "rb")
+    CHANNEL_OUT = os.fdopen(os.dup(1), "wb")
+    os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+    os.dup2(2, 1)
+
+# Warm the imports every job starts with
+import cadquery as cq
+import numpy as np
+from cadquery import exporters
+
+HEADER = struct.Struct(">I")
+# Successful bbox replies skip JSON; the tag can't start a JSON object
+BBOX_REPLY = struct.Struct("<Bddd")
+BBOX_TAG = 0x01
+READY = b"\x01"
+
+# Compiled user code by digest, so re-running the same code (validation,
+# then STL export, then re-renders) skips the parse and compile
+CODE_CACHE: OrderedDict[bytes, CodeType] = OrderedDict()
+CODE_CACHE_SIZE = 256
+
+# OCCT's STL writer only takes a path; stage in-memory exports on tmpfs
+STAGING_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# Names every job can use without importing; copied per job so jobs can't
+# leak state into each other
+SANDBOX_GLOBALS = {
+    "__name__": "__main__",
+    "cq": cq,
+    "exporters": exporters,
+    "math": math,
+    "np": np,
+}
+
+
+# Set while a job runs, so SIGINT only ever interrupts user code
+JOB_RUNNING = False
+
+
+def _on_interrupt(signum, frame) -> None:
+    if JOB_RUNNING:
+        raise KeyboardInterrupt
+
+
+def _read_exact(stream, size: int) -> bytes | None:
+    """Read exactly size bytes, or None on EOF."""
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return data
+
+
+def _warm_up() -> None:
+    """Run a throwaway model so OCCT's lazy setup isn't paid by the first job."""
+    try:
+        shape = cq.Workplane("XY").box(10, 10, 10).edges("|Z").fillet(1).faces(">Z").shell(-1)
+        shape.val().BoundingBox()
+    except Exception:
+        pass
+
+
+def _limit_memory(megabytes: int) -> None:
+    """Cap the address space so a runaway model fails with MemoryError."""
+    if megabytes > 0:
+        limit = megabytes * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _limit_cpu(seconds: float) -> None:
+    """Let the next job use at most `seconds` more CPU time.
+
+    RLIMIT_CPU counts the process's whole lifetime, so the soft limit is
+    moved forward from the CPU time used so far before every job.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _shape_of(result):
+    """Get something with a BoundingBox - handle both Workplane and Shape objects."""
+    if hasattr(result, 'val'):
+        return result.val()
+    if hasattr(result, 'wrapped'):
+        return result.wrapped
+    if hasattr(result, 'BoundingBox'):
+        return result
+    # Try to get shape from build() if it's a library object
+    if hasattr(result, 'build'):
+        built = result.build()
+        return built.val() if hasattr(built, 'val') else built
+    return result
+
+
+def _compile(code: str) -> CodeType:
+    key = hashlib.blake2b(code.encode(), digest_size=16).digest()
+    compiled = CODE_CACHE.get(key)
+    if compiled is None:
+        compiled = compile(code, "<cad>", "exec")
+        CODE_CACHE[key] = compiled
+        if len(CODE_CACHE) > CODE_CACHE_SIZE:
+            CODE_CACHE.popitem(last=False)
+    else:
+        CODE_CACHE.move_to_end(key)
+    return compiled
+
+
+def _export_stl_bytes(shape) -> bytes:
+    """Export shape as STL through an anonymous staging file and return it."""
+    try:
+        # O_TMPFILE: an unnamed inode, so no directory entry is created or
+        # removed; OCCT writes to it through its /proc/self/fd path
+        fd = os.open(STAGING_DIR, os.O_TMPFILE | os.O_RDWR, 0o600)
+    except (AttributeError, OSError):
+        # Not Linux, or the filesystem doesn't support it
+        with tempfile.NamedTemporaryFile(suffix=".stl", dir=STAGING_DIR) as staging:
+            exporters.export(shape, staging.name, exportType="STL")
+            return staging.read()
+    with os.fdopen(fd, "rb") as staging:
+        exporters.export(shape, f"/proc/self/fd/{fd}", exportType="STL")
+        return staging.read()
+
+
+def _execute(code: str):
+    """Run user code in a fresh namespace and return the `result` it defines."""
+    namespace = dict(SANDBOX_GLOBALS)
+    exec(_compile(code), namespace)
+    if "result" not in namespace:
+        raise NameError("name 'result' is not defined")
+    return namespace["result"]
+
+
+def _measure(result) -> dict:
+    bbox = _shape_of(result).BoundingBox()
+    return {"x": bbox.xlen, "y": bbox.ylen, "z": bbox.zlen}
+
+
+def _measure_each(codes: list[str]) -> list[dict]:
+    """Measure every code independently; one failure doesn't stop the rest."""
+    results = []
+    for code in codes:
+        try:
+            results.append({"success": True, "bounding_box": _measure(_execute(code))})
+        except BaseException as e:
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            results.append({"success": False, "error": str(e) or type(e).__name__})
+    return results
+
+
+def _run_job(job: dict) -> tuple[dict, bytes]:
+    if job["op"] == "bbox_batch":
+        return {"success": True, "results": _measure_each(job["codes"])}, b""
+
+    result = _execute(job["code"])
+
+    if job["op"] == "bbox":
+        return {"success": True, "bounding_box": _measure(result)}, b""
+
+    # Library objects like cq_gears.SpurGear need to call build()
+    export_shape = result.build() if hasattr(result, 'build') else result
+
+    if job["op"] == "stl":
+        exporters.export(export_shape, job["stl_path"])
+        return {"success": True, "path": job["stl_path"]}, b""
+
+    if job["op"] == "stl_bytes":
+        return {"success": True}, _export_stl_bytes(export_shape)
+
+    raise ValueError(f"Unknown op: {job['op']}")
+
+
+def main() -> None:
+    global JOB_RUNNING
+    signal.signal(signal.SIGINT, _on_interrupt)
+    _warm_up()
+    # Applied after the imports and warm-up so only jobs count against it
+    _limit_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    CHANNEL_OUT.write(HEADER.pack(len(READY)) + READY)
+    CHANNEL_OUT.flush()
+
+    while True:
+        header = _read_exact(CHANNEL_IN, HEADER.size)
+        if header is None:
+            return
+        payload = _read_exact(CHANNEL_IN, HEADER.unpack(header)[0])
+        if payload is None:
+            return
+
+        # The user code's prints are discarded rather than sent to stderr
+        with contextlib.redirect_stdout(io.StringIO()):
+            attachment = b""
+            try:
+                job = orjson.loads(payload)
+                if job.get("cpu_limit"):
+                    _limit_cpu(job["cpu_limit"])
+                JOB_RUNNING = True
+                reply, attachment = _run_job(job)
+                JOB_RUNNING = False
+            except KeyboardInterrupt:
+                JOB_RUNNING = False
+                reply = {"success": False, "error": "Cancelled"}
+            except BaseException as e:
+                JOB_RUNNING = False
+                # Covers sys.exit() in user code as well as ordinary errors;
+                # the parent only reports the message, so no traceback is sent
+                reply = {"success": False, "error": str(e) or type(e).__name__}
+
+        if reply.get("bounding_box"):
+            bbox = reply["bounding_box"]
+            output = BBOX_REPLY.pack(BBOX_TAG, bbox["x"], bbox["y"], bbox["z"])
+        else:
+            output = orjson.dumps(reply)
+        # Separate writes into the buffered channel rather than concatenating
+        # header and body into another copy
+        CHANNEL_OUT.write(HEADER.pack(len(output)))
+        CHANNEL_OUT.write(output)
+        CHANNEL_OUT.write(HEADER.pack(len(attachment)))
+        CHANNEL_OUT.write(attachment)
+        CHANNEL_OUT.flush()
+
+
+if __name__ == "__main__":
+    main()
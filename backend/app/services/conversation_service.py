@@ -8,15 +8,37 @@ Model strategy:
 - Fast models (Haiku/Nano) for agent conversations (questions, analysis)
 - Best models (Opus/GPT-5.2 Pro) for final code generation
 """
-import json
-import re
+import asyncio
+import time
 import uuid
+import orjson
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Literal
+from typing import AsyncIterator, Literal
 
 from app.config import settings
+from app.services.llm_json import JsonObjectScanner, extract_json
+
+
+def _requirements_blob(requirements: "DesignRequirements") -> str:
+    """Requirements as indented JSON for agent prompts (non-ASCII kept as-is)."""
+    return orjson.dumps(
+        requirements.to_dict(), option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    ).decode()
+
+
+# (provider, model) for agent conversations, and the final code generation
+# model per provider
+_FAST_MODEL = ("anthropic", "claude-haiku-4-5-20251001")
+_BEST_MODELS = {
+    "anthropic": "claude-opus-4-5-20251101",
+    "openai": "gpt-5.2-pro",
+}
+
+# Most recent messages included in agent prompts as conversation history
+HISTORY_MESSAGES = 10
 
 
 def get_fast_model() -> tuple[str, str]:
@@ -25,7 +47,7 @@ def get_fast_model() -> tuple[str, str]:
     Always uses Anthropic Haiku for conversations - faster and cheaper.
     Returns (provider, model) tuple.
     """
-    return ("anthropic", "claude-haiku-4-5-20251001")
+    return _FAST_MODEL
 
 
 def get_best_model(provider: str) -> str:
@@ -33,9 +55,7 @@ def get_best_model(provider: str) -> str:
     
     Uses the user's selected provider for final generation.
     """
-    if provider == "anthropic":
-        return "claude-opus-4-5-20251101"
-    return "gpt-5.2-pro"
+    return _BEST_MODELS.get(provider, _BEST_MODELS["openai"])
 
 
 class AgentRole(str, Enum):
@@ -70,7 +90,7 @@ class ConversationPhase(str, Enum):
     COMPLETE = "complete"           # Conversation complete
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationMessage:
     """A message in the conversation."""
     id: str
@@ -91,7 +111,7 @@ class ConversationMessage:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class DesignRequirements:
     """Structured requirements gathered from conversation."""
     # Basic info
@@ -178,7 +198,7 @@ class DesignRequirements:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ImageAttachment:
     """An image or sketch attachment."""
     id: str
@@ -188,7 +208,7 @@ class ImageAttachment:
     is_sketch: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationSession:
     """A design conversation session."""
     id: str
@@ -205,6 +225,10 @@ class ConversationSession:
     context_parts: list[tuple[str, str]] | None = None
     created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     updated_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    # Formatted history lines, kept in step with messages by add_message
+    history: deque[str] = field(default_factory=lambda: deque(maxlen=HISTORY_MESSAGES), repr=False)
+    # get_all_images() result; reset by add_attachment
+    images_cache: list[tuple[str, str]] | None = field(default=None, init=False, repr=False)
     
     def to_dict(self) -> dict:
         return {
@@ -229,17 +253,22 @@ class ConversationSession:
         return self.image_data is not None or len(self.attachments) > 0
     
     def get_all_images(self) -> list[tuple[str, str]]:
-        """Get all images as (data, mime_type) tuples."""
-        images = []
+        """Get all images as (data, mime_type) tuples.
+        
+        The list is built once and reused until an attachment is added;
+        callers must not modify it.
+        """
+        if self.images_cache is not None:
+            return self.images_cache
         
-        # Add attachments first
-        for att in self.attachments:
-            images.append((att.data, att.mime_type))
+        # Attachments first
+        images = [(att.data, att.mime_type) for att in self.attachments]
         
         # Add legacy single image if present and no attachments
         if self.image_data and not self.attachments:
             images.append((self.image_data, self.image_mime_type or "image/jpeg"))
         
+        self.images_cache = images
         return images
     
     def add_message(
@@ -257,12 +286,55 @@ class ConversationSession:
             data=data or {},
         )
         self.messages.append(msg)
+        self.history.append(f"[{agent_role.value if agent_role else 'user'}]: {content}")
         self.updated_at = datetime.utcnow().isoformat()
         return msg
 
 
-# In-memory session storage (in production, use Redis or database)
-_sessions: dict[str, ConversationSession] = {}
+class SessionStore:
+    """In-memory session storage, bounded by count and idle time.
+    
+    Sessions are kept in least-recently-used order, so expired ones are
+    always at the front and are evicted lazily on each access; the oldest
+    session is dropped once `max_sessions` is exceeded.
+    """
+    
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, tuple[ConversationSession, float]] = OrderedDict()
+    
+    def _evict_expired(self, now: float) -> None:
+        while self._sessions:
+            _, last_used = next(iter(self._sessions.values()))
+            if now - last_used < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+    
+    def get(self, session_id: str) -> ConversationSession | None:
+        now = time.monotonic()
+        self._evict_expired(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        self._sessions[session_id] = (entry[0], now)
+        self._sessions.move_to_end(session_id)
+        return entry[0]
+    
+    def put(self, session: ConversationSession) -> None:
+        now = time.monotonic()
+        self._evict_expired(now)
+        self._sessions[session.id] = (session, now)
+        self._sessions.move_to_end(session.id)
+        if len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+    
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+
+# Per process; sessions hold base64 attachments, so both limits matter
+_sessions = SessionStore(settings.conversation_max_sessions, settings.conversation_session_ttl)
 
 
 class ConversationService:
@@ -328,7 +400,7 @@ class ConversationService:
                 content=f"📎 {' et '.join(parts)} ajouté(s) comme référence",
             )
         
-        _sessions[session_id] = session
+        _sessions.put(session)
         return session
     
     def add_attachment(
@@ -353,6 +425,7 @@ class ConversationService:
         )
         
         session.attachments.append(attachment)
+        session.images_cache = None
         session.updated_at = datetime.utcnow().isoformat()
         
         return attachment
@@ -363,10 +436,7 @@ class ConversationService:
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a session."""
-        if session_id in _sessions:
-            del _sessions[session_id]
-            return True
-        return False
+        return _sessions.delete(session_id)
     
     async def process_user_message(
         self,
@@ -446,7 +516,7 @@ class ConversationService:
 {history}
 
 Exigences actuelles:
-{json.dumps(session.requirements.to_dict(), indent=2, ensure_ascii=False)}
+{_requirements_blob(session.requirements)}
 
 Analyse la dernière réponse de l'utilisateur et:
 1. Mets à jour les exigences avec les nouvelles informations
@@ -470,19 +540,17 @@ Réponds en JSON:
         try:
             # Use fast model for agent conversations (always Anthropic Haiku)
             fast_provider, fast_model = get_fast_model()
-            response = await llm_service.generate_raw(
-                prompt,
-                REQUIREMENTS_AGENT_PROMPT,
-                fast_provider,
-                fast_model,
-                max_tokens=2000,
+            data = await self._stream_json(
+                llm_service.generate_raw_stream(
+                    prompt,
+                    REQUIREMENTS_AGENT_PROMPT,
+                    fast_provider,
+                    fast_model,
+                    max_tokens=2000,
+                )
             )
             
-            # Parse response
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                data = json.loads(json_match.group())
-                
+            if data is not None:
                 # Update requirements
                 self._update_requirements(session.requirements, data.get("updated_requirements", {}))
                 
@@ -522,6 +590,22 @@ Réponds en JSON:
         
         return {"session": session.to_dict(), "needs_response": True}
     
+    async def _stream_json(self, stream: AsyncIterator[str]) -> dict | None:
+        """Read a streamed response only until its JSON object is complete.
+        
+        Any trailing prose the model would add after the object is never
+        waited for: the stream is closed as soon as the object closes.
+        """
+        scanner = JsonObjectScanner()
+        try:
+            async for chunk in stream:
+                data = scanner.feed(chunk)
+                if data is not None:
+                    return data
+        finally:
+            await stream.aclose()
+        return None
+    
     async def _transition_to_analyzing(
         self,
         session: ConversationSession,
@@ -529,14 +613,14 @@ Réponds en JSON:
         model: str | None,
     ) -> dict:
         """Transition to analysis phase with specialist agents."""
-        from app.services.llm_service import llm_service
         from app.prompts.conversation_prompts import (
             DESIGNER_AGENT_PROMPT,
             PHYSICS_AGENT_PROMPT,
             MANUFACTURING_AGENT_PROMPT,
         )
         
-        requirements_json = json.dumps(session.requirements.to_dict(), indent=2, ensure_ascii=False)
+        # Serialized once and shared by every specialist prompt
+        requirements_json = _requirements_blob(session.requirements)
         
         # Coordinator announces analysis phase
         session.add_message(
@@ -545,8 +629,6 @@ Réponds en JSON:
             content="Parfait ! J'ai maintenant assez d'informations. Laissez-moi consulter nos spécialistes...",
         )
         
-        analyses = []
-        
         # Designer analysis
         designer_prompt = f"""Exigences du projet:
 {requirements_json}
@@ -566,18 +648,11 @@ Réponds en JSON:
   "design_approach": "..."
 }}"""
         
-        try:
-            # Use fast model for agent analysis (always Anthropic Haiku)
-            fast_provider, fast_model = get_fast_model()
-            designer_response = await llm_service.generate_raw(
-                designer_prompt, DESIGNER_AGENT_PROMPT, fast_provider, fast_model, max_tokens=1500
-            )
-            json_match = re.search(r'\{[\s\S]*\}', designer_response)
-            if json_match:
-                designer_data = json.loads(json_match.group())
-                analyses.append(("designer", designer_data))
-        except:
-            pass
+        # Use fast model for agent analysis (always Anthropic Haiku)
+        fast_provider, fast_model = get_fast_model()
+        specialists = [
+            self._run_specialist("designer", designer_prompt, DESIGNER_AGENT_PROMPT, fast_provider, fast_model),
+        ]
         
         # Physics analysis (if structural concerns)
         if session.requirements.needs_structural_analysis or session.requirements.expected_load:
@@ -598,17 +673,9 @@ Réponds en JSON:
   "reinforcement_suggestions": ["..."],
   "print_orientation": "..."
 }}"""
-            
-            try:
-                physics_response = await llm_service.generate_raw(
-                    physics_prompt, PHYSICS_AGENT_PROMPT, fast_provider, fast_model, max_tokens=1500
-                )
-                json_match = re.search(r'\{[\s\S]*\}', physics_response)
-                if json_match:
-                    physics_data = json.loads(json_match.group())
-                    analyses.append(("physics", physics_data))
-            except:
-                pass
+            specialists.append(
+                self._run_specialist("physics", physics_prompt, PHYSICS_AGENT_PROMPT, fast_provider, fast_model)
+            )
         
         # Manufacturing analysis
         manufacturing_prompt = f"""Exigences du projet:
@@ -630,17 +697,14 @@ Réponds en JSON:
   "potential_issues": ["..."],
   "recommendations": ["..."]
 }}"""
+        specialists.append(
+            self._run_specialist("manufacturing", manufacturing_prompt, MANUFACTURING_AGENT_PROMPT, fast_provider, fast_model)
+        )
         
-        try:
-            manufacturing_response = await llm_service.generate_raw(
-                manufacturing_prompt, MANUFACTURING_AGENT_PROMPT, fast_provider, fast_model, max_tokens=1500
-            )
-            json_match = re.search(r'\{[\s\S]*\}', manufacturing_response)
-            if json_match:
-                manufacturing_data = json.loads(json_match.group())
-                analyses.append(("manufacturing", manufacturing_data))
-        except:
-            pass
+        # The specialists are independent: consult them concurrently, keeping
+        # their declared order; failed analyses are skipped
+        results = await asyncio.gather(*specialists, return_exceptions=True)
+        analyses = [r for r in results if isinstance(r, tuple)]
         
         # Compile and present analysis
         analysis_summary = self._compile_analysis_summary(analyses)
@@ -667,6 +731,28 @@ Réponds en JSON:
         
         return {"session": session.to_dict(), "needs_response": True}
     
+    async def _run_specialist(
+        self,
+        tag: str,
+        prompt: str,
+        system_prompt: str,
+        provider: str,
+        model: str,
+    ) -> tuple[str, dict] | None:
+        """Run one specialist analysis and return (tag, parsed JSON), or None on failure."""
+        from app.services.llm_service import llm_service
+        
+        try:
+            response = await llm_service.generate_raw(
+                prompt, system_prompt, provider, model, max_tokens=1500
+            )
+            data = extract_json(response)
+            if data:
+                return (tag, data)
+        except Exception:
+            pass
+        return None
+    
     async def _handle_analyzing_phase(
         self,
         session: ConversationSession,
@@ -879,9 +965,9 @@ Réponds en JSON:
             response = await llm_service.generate_raw(
                 prompt, COORDINATOR_AGENT_PROMPT, fast_provider, fast_model, max_tokens=1000
             )
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                return json.loads(json_match.group())
+            data = extract_json(response)
+            if data:
+                return data
         except:
             pass
         
@@ -895,12 +981,8 @@ Réponds en JSON:
         }
     
     def _build_conversation_history(self, session: ConversationSession) -> str:
-        """Build a text representation of conversation history."""
-        lines = []
-        for msg in session.messages[-10:]:  # Last 10 messages
-            role = msg.agent_role.value if msg.agent_role else "user"
-            lines.append(f"[{role}]: {msg.content}")
-        return "\n".join(lines)
+        """Build a text representation of conversation history (last 10 messages)."""
+        return "\n".join(session.history)
     
     def _update_requirements(self, requirements: DesignRequirements, updates: dict):
         """Update requirements from parsed data."""
@@ -1,11 +1,20 @@
 """Service for importing 3D files (STL, OBJ, 3MF)."""
 import io
+import os
 import struct
+import uuid
 import zipfile
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from typing import BinaryIO
 
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Part
+
 
 @dataclass
 class ImportResult:
@@ -21,17 +30,18 @@ def _calculate_bounding_box(vertices: list[list[float]]) -> dict:
     if not vertices:
         return {"min_x": 0, "min_y": 0, "min_z": 0, "max_x": 0, "max_y": 0, "max_z": 0}
     
-    xs = [v[0] for v in vertices]
-    ys = [v[1] for v in vertices]
-    zs = [v[2] for v in vertices]
+    # Vectorized min/max over an (N, 3) array instead of per-axis Python loops
+    points = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    mins = points.min(axis=0)
+    maxs = points.max(axis=0)
     
     return {
-        "min_x": min(xs),
-        "min_y": min(ys),
-        "min_z": min(zs),
-        "max_x": max(xs),
-        "max_y": max(ys),
-        "max_z": max(zs),
+        "min_x": float(mins[0]),
+        "min_y": float(mins[1]),
+        "min_z": float(mins[2]),
+        "max_x": float(maxs[0]),
+        "max_y": float(maxs[1]),
+        "max_z": float(maxs[2]),
     }
 
 
@@ -244,8 +254,15 @@ def parse_3mf(file: BinaryIO, filename: str) -> ImportResult:
         return ImportResult(success=False, error=f"Failed to parse 3MF: {str(e)}")
 
 
-def import_file(file: BinaryIO, filename: str) -> ImportResult:
-    """Import a 3D file based on its extension."""
+def import_file(file: BinaryIO | str, filename: str) -> ImportResult:
+    """Import a 3D file based on its extension.
+    
+    ``file`` may be an open binary file or a path to the file on disk.
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return import_file(f, filename)
+    
     filename_lower = filename.lower()
     
     if filename_lower.endswith('.stl'):
@@ -261,7 +278,78 @@ def import_file(file: BinaryIO, filename: str) -> ImportResult:
         )
 
 
+# Content-addressed mesh storage: one file per distinct upload, shared by parts
+MESH_MAGIC = b"MESH"
+MESH_HEADER = struct.Struct('<4sII')  # magic, vertex count, face count
+
+
+def mesh_path(digest: str) -> str:
+    """Path of the stored mesh for a content digest."""
+    return os.path.join(settings.temp_dir, "meshes", digest[:2], digest[2:] + ".bin")
+
+
+def store_mesh(digest: str, vertices: list[list[float]], faces: list[list[int]]) -> str:
+    """Write mesh data as contiguous little-endian arrays, unless already stored.
+    
+    Layout: 12-byte header (b"MESH", vertex count, face count as uint32),
+    float32 vertices (N x 3), then uint32 faces (M x 3). Both arrays start
+    on 4-byte boundaries so the viewer can map them straight into typed arrays.
+    """
+    path = mesh_path(digest)
+    if os.path.exists(path):
+        return path
+    
+    verts = np.asarray(vertices, dtype='<f4').reshape(-1, 3)
+    tris = np.asarray(faces, dtype='<u4').reshape(-1, 3)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    # Write under a unique name then rename, so readers never see a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MESH_HEADER.pack(MESH_MAGIC, len(verts), len(tris)))
+        f.write(verts.tobytes())
+        f.write(tris.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+async def lock_mesh(db: AsyncSession, digest: str) -> None:
+    """Hold the digest's advisory lock until the current transaction ends.
+    
+    Imports take it around storing the file and committing the part that
+    references it, and releases around checking references and unlinking,
+    so a release can never remove a file an import is about to reference.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(digest))))
+
+
+async def release_meshes(db: AsyncSession, digests: list[str]) -> None:
+    """Delete stored meshes that are no longer referenced by any part."""
+    digests = {d for d in digests if d}
+    if not digests:
+        return
+    
+    try:
+        # Sorted so concurrent releases take the locks in the same order
+        for digest in sorted(digests):
+            await lock_mesh(db, digest)
+        result = await db.execute(
+            select(Part.mesh_digest).where(Part.mesh_digest.in_(digests)).distinct()
+        )
+        for digest in digests - set(result.scalars()):
+            try:
+                os.unlink(mesh_path(digest))
+            except FileNotFoundError:
+                pass
+    finally:
+        await db.rollback()  # Nothing to write; just ends the transaction and its locks
+
+
 # Singleton instance
 import_service = type('ImportService', (), {
     'import_file': staticmethod(import_file),
+    'mesh_path': staticmethod(mesh_path),
+    'store_mesh': staticmethod(store_mesh),
+    'lock_mesh': staticmethod(lock_mesh),
+    'release_meshes': staticmethod(release_meshes),
 })()
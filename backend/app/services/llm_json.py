@@ -0,0 +1,66 @@
+"""Extraction of the JSON object an LLM response embeds in surrounding prose."""
+import orjson
+
+
+class JsonObjectScanner:
+    """Finds the first JSON object in text that may arrive in pieces.
+    
+    Tracks brace depth in a single pass, ignoring braces inside string
+    literals. A balanced slice that doesn't parse (prose like "{x}") is
+    skipped and scanning resumes at the next brace, so a streamed response
+    can be cut off as soon as its object closes.
+    """
+    __slots__ = ("_text", "_pos", "_depth", "_in_string", "_escaped")
+    
+    def __init__(self):
+        self._text = ""  # From the current candidate's opening brace
+        self._pos = 0  # Next character to scan in _text
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, chunk: str) -> dict | None:
+        """Scan the next piece; returns the object once one is complete."""
+        text = self._text + chunk
+        while True:
+            if self._depth == 0:
+                # Not inside a candidate: drop everything before the next brace
+                start = text.find("{", self._pos)
+                if start == -1:
+                    self._text, self._pos = "", 0
+                    return None
+                text, self._pos = text[start:], 0
+            for i in range(self._pos, len(text)):
+                c = text[i]
+                if self._in_string:
+                    if self._escaped:
+                        self._escaped = False
+                    elif c == "\\":
+                        self._escaped = True
+                    elif c == '"':
+                        self._in_string = False
+                elif c == '"':
+                    self._in_string = True
+                elif c == "{":
+                    self._depth += 1
+                elif c == "}":
+                    self._depth -= 1
+                    if self._depth == 0:
+                        try:
+                            data = orjson.loads(text[:i + 1])
+                        except orjson.JSONDecodeError:
+                            data = None
+                        if isinstance(data, dict):
+                            return data
+                        # Resume just past this candidate's opening brace
+                        self._pos = 1
+                        self._in_string = self._escaped = False
+                        break
+            else:
+                self._text, self._pos = text, len(text)
+                return None
+
+
+def extract_json(text: str) -> dict | None:
+    """The first JSON object embedded in an LLM response, if any."""
+    return JsonObjectScanner().feed(text)
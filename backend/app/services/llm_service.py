@@ -1,4 +1,5 @@
-from typing import Literal
+import asyncio
+from typing import Any, AsyncIterator, Literal
 import openai
 import anthropic
 
@@ -37,27 +38,44 @@ FAST_ANTHROPIC_MODEL = "claude-haiku-4-5-20251001"
 BEST_OPENAI_MODEL = "gpt-5.2-pro"
 BEST_ANTHROPIC_MODEL = "claude-opus-4-5-20251101"
 
+# Anthropic prompt-cache breakpoint: everything up to and including a block
+# marked with it is cached for ~5 minutes and re-read at a fraction of the cost
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def cached_system(system_prompt: str) -> list[dict]:
+    """Wrap an Anthropic system prompt as a cacheable text block."""
+    return [{"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}]
+
 
 class LLMService:
     """Unified service for LLM code generation."""
     
     def __init__(self):
-        self.openai_client = None
-        self.anthropic_client = None
+        # One client per (provider, event loop): each wraps an httpx connection
+        # pool bound to the loop that created it
+        self._clients: dict[tuple[str, int], Any] = {}
+    
+    def _get_client(self, provider: str, api_key: str, factory):
+        key = (provider, id(asyncio.get_running_loop()))
+        client = self._clients.get(key)
+        if client is None:
+            if not api_key:
+                raise ValueError(f"{provider.capitalize()} API key not configured")
+            client = self._clients[key] = factory(api_key=api_key)
+        return client
     
     def _get_openai_client(self):
-        if not self.openai_client:
-            if not settings.openai_api_key:
-                raise ValueError("OpenAI API key not configured")
-            self.openai_client = openai.AsyncOpenAI(api_key=settings.openai_api_key)
-        return self.openai_client
+        return self._get_client("openai", settings.openai_api_key, openai.AsyncOpenAI)
     
     def _get_anthropic_client(self):
-        if not self.anthropic_client:
-            if not settings.anthropic_api_key:
-                raise ValueError("Anthropic API key not configured")
-            self.anthropic_client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
-        return self.anthropic_client
+        return self._get_client("anthropic", settings.anthropic_api_key, anthropic.AsyncAnthropic)
+    
+    async def close(self) -> None:
+        """Close the clients created on the running event loop."""
+        loop_id = id(asyncio.get_running_loop())
+        for key in [key for key in self._clients if key[1] == loop_id]:
+            await self._clients.pop(key).close()
     
     async def generate_cad_code(
         self,
@@ -180,7 +198,7 @@ Modifications demandées: {prompt}"""
         response = await client.messages.create(
             model=model_to_use,
             max_tokens=4000,
-            system=system_prompt,
+            system=cached_system(system_prompt),
             messages=[
                 {"role": "user", "content": user_prompt},
             ],
@@ -240,7 +258,7 @@ Modifications demandées: {prompt}"""
             response = await client.messages.create(
                 model=model_to_use,
                 max_tokens=max_tokens,
-                system=system_prompt,
+                system=cached_system(system_prompt),
                 messages=[
                     {"role": "user", "content": user_prompt},
                 ],
@@ -250,6 +268,56 @@ Modifications demandées: {prompt}"""
         else:
             raise ValueError(f"Unknown provider: {provider}")
     
+    async def generate_raw_stream(
+        self,
+        user_prompt: str,
+        system_prompt: str,
+        provider: Literal["openai", "anthropic"],
+        model: str | None = None,
+        max_tokens: int = 8000,
+    ) -> AsyncIterator[str]:
+        """Stream a raw response from the LLM as text chunks.
+        
+        Closing the iterator early (e.g. once the needed JSON has arrived)
+        closes the provider stream, so the rest is not generated for nothing.
+        """
+        if provider == "openai":
+            client = self._get_openai_client()
+            model_to_use = model if model and model in OPENAI_MODELS else DEFAULT_OPENAI_MODEL
+            stream = await client.chat.completions.create(
+                model=model_to_use,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=0.3,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        
+        elif provider == "anthropic":
+            client = self._get_anthropic_client()
+            model_to_use = model if model and model in ANTHROPIC_MODELS else DEFAULT_ANTHROPIC_MODEL
+            async with client.messages.stream(
+                model=model_to_use,
+                max_tokens=max_tokens,
+                system=cached_system(system_prompt),
+                messages=[
+                    {"role": "user", "content": user_prompt},
+                ],
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+    
     async def generate_with_vision(
         self,
         user_prompt: str,
@@ -305,6 +373,9 @@ Modifications demandées: {prompt}"""
                         "data": base64_data,
                     }
                 })
+            if content:
+                # Cache system prompt + images; only the text varies per call
+                content[-1]["cache_control"] = CACHE_CONTROL
             content.append({
                 "type": "text",
                 "text": user_prompt
@@ -313,7 +384,7 @@ Modifications demandées: {prompt}"""
             response = await client.messages.create(
                 model=model_to_use,
                 max_tokens=max_tokens,
-                system=system_prompt,
+                system=cached_system(system_prompt),
                 messages=[
                     {"role": "user", "content": content},
                 ],
@@ -1,5 +1,8 @@
 import ast
+import hashlib
 import re
+import threading
+from collections import OrderedDict
 from typing import Any
 
 
@@ -20,8 +23,35 @@ class ParameterService:
         r'^(min|max|total|base|top|bottom|left|right|front|back)_',
     ]
     
+    # Maximum number of code bodies kept in the extraction cache
+    CACHE_SIZE = 1024
+    
+    def __init__(self):
+        # Extraction results keyed by SHA-1 of the code (autosave re-sends identical bodies)
+        self._cache: OrderedDict[bytes, list[dict[str, Any]]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
     def extract_parameters(self, code: str) -> list[dict[str, Any]]:
         """Extract numeric parameters from the beginning of CadQuery code."""
+        key = hashlib.sha1(code.encode(), usedforsecurity=False).digest()
+        
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        
+        if cached is None:
+            cached = self._extract_parameters(code)
+            with self._cache_lock:
+                self._cache[key] = cached
+                if len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        
+        # Callers store the result on models, so hand out copies
+        return [dict(param) for param in cached]
+    
+    def _extract_parameters(self, code: str) -> list[dict[str, Any]]:
+        """Parse code and extract its leading numeric dimension assignments."""
         parameters = []
         
         try:
@@ -0,0 +1,76 @@
+"""Short-lived cache of the section listing body.
+
+The listing is keyed by the caller on the latest section and project update
+times. Writes those timestamps miss (deletes, parts added or removed) are
+caught by the session hooks below, which drop the cache once such a write
+commits, whichever endpoint or service made it. The cache is per process:
+other app processes see such a change once their TTL runs out.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Section, Project, Part
+
+
+SECTIONS_CACHE_TTL = 2.0  # seconds
+
+_cached: tuple[tuple, float, bytes] | None = None  # (state, expiry, body)
+
+
+def get(state: tuple) -> bytes | None:
+    """The cached listing body, if it was built for this state and is fresh."""
+    if _cached and _cached[0] == state and _cached[1] > time.monotonic():
+        return _cached[2]
+    return None
+
+
+def put(state: tuple, body: bytes) -> None:
+    global _cached
+    _cached = (state, time.monotonic() + SECTIONS_CACHE_TTL, body)
+
+
+def invalidate() -> None:
+    """Drop the cached listing."""
+    global _cached
+    _cached = None
+
+
+# Tables whose writes can change the listing: any section or project
+# change, but only part inserts and deletes (the listing counts parts)
+_LISTED_TABLES = {Section.__tablename__, Project.__tablename__}
+_COUNTED_TABLES = {Part.__tablename__}
+
+
+def _mark_stale(session: Session) -> None:
+    session.info["sections_stale"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    if any(isinstance(obj, (Section, Project, Part)) for obj in (*session.new, *session.deleted)):
+        _mark_stale(session)
+    elif any(isinstance(obj, (Section, Project)) for obj in session.dirty):
+        _mark_stale(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state) -> None:
+    # Bulk and Core-style INSERT/UPDATE/DELETE statements bypass the flush
+    table = getattr(getattr(state.statement, "table", None), "name", None)
+    if table in _LISTED_TABLES and (state.is_insert or state.is_update or state.is_delete):
+        _mark_stale(state.session)
+    elif table in _COUNTED_TABLES and (state.is_insert or state.is_delete):
+        _mark_stale(state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop("sections_stale", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop("sections_stale", None)
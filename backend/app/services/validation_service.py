@@ -7,6 +7,14 @@ import ast
 from dataclasses import dataclass
 
 
+# Patterns used on every validation pass, compiled once at import
+_RESULT_RE = re.compile(r'^result\s*=', re.MULTILINE)
+_FILLET_RE = re.compile(r'\.fillet\((\d+(?:\.\d+)?)\)')
+_TRAILING_SHELL_RE = re.compile(r'\.shell\([^)]+\)\s*$', re.MULTILINE)
+_SHELL_RE = re.compile(r'\.shell\(([^)]+)\)')
+_CYLINDER_EDGE_FILLET_RE = re.compile(r'\.edges\("\|Z"\)\s*\.(?:fillet|chamfer)\(')
+
+
 @dataclass
 class ValidationResult:
     is_valid: bool
@@ -20,16 +28,19 @@ class CodeValidator:
     
     # Common errors and their fixes
     CORRECTIONS = [
-        # Wrong method names
-        (r'\.add\(', '.union('),
-        (r'\.subtract\(', '.cut('),
-        # Common typos
-        (r'\.fillett\(', '.fillet('),
-        (r'\.champher\(', '.chamfer('),
-        (r'\.exturde\(', '.extrude('),
-        # Wrong import statements
-        (r'from cadquery import \*', 'import cadquery as cq'),
-        (r'import CadQuery', 'import cadquery as cq'),
+        (re.compile(pattern), replacement)
+        for pattern, replacement in [
+            # Wrong method names
+            (r'\.add\(', '.union('),
+            (r'\.subtract\(', '.cut('),
+            # Common typos
+            (r'\.fillett\(', '.fillet('),
+            (r'\.champher\(', '.chamfer('),
+            (r'\.exturde\(', '.extrude('),
+            # Wrong import statements
+            (r'from cadquery import \*', 'import cadquery as cq'),
+            (r'import CadQuery', 'import cadquery as cq'),
+        ]
     ]
     
     # Dangerous patterns that could indicate hallucinated methods
@@ -66,9 +77,9 @@ class CodeValidator:
         
         # Apply auto-corrections
         for pattern, replacement in self.CORRECTIONS:
-            if re.search(pattern, corrected_code):
-                warnings.append(f"Auto-corrected: {pattern} → {replacement}")
-                corrected_code = re.sub(pattern, replacement, corrected_code)
+            if pattern.search(corrected_code):
+                warnings.append(f"Auto-corrected: {pattern.pattern} → {replacement}")
+                corrected_code = pattern.sub(replacement, corrected_code)
         
         # Check for common anti-patterns
         antipattern_warnings = self._check_antipatterns(code)
@@ -94,15 +105,8 @@ class CodeValidator:
     
     def _has_result_variable(self, code: str) -> bool:
         """Check if code defines a 'result' variable."""
-        # Simple check for result assignment
-        patterns = [
-            r'^result\s*=',      # result = ...
-            r'\nresult\s*=',     # newline result = ...
-        ]
-        for pattern in patterns:
-            if re.search(pattern, code, re.MULTILINE):
-                return True
-        return False
+        # Simple check for a line starting with "result ="
+        return _RESULT_RE.search(code) is not None
     
     def _check_syntax(self, code: str) -> str | None:
         """Check for Python syntax errors."""
@@ -117,7 +121,7 @@ class CodeValidator:
         warnings = []
         
         # Check for very large fillet values
-        fillet_match = re.search(r'\.fillet\((\d+(?:\.\d+)?)\)', code)
+        fillet_match = _FILLET_RE.search(code)
         if fillet_match:
             fillet_value = float(fillet_match.group(1))
             if fillet_value > 10:
@@ -132,8 +136,8 @@ class CodeValidator:
             warnings.append("sweep() can fail on complex paths - test carefully")
         
         # Check for shell without face selection
-        if re.search(r'\.shell\([^)]+\)\s*$', code, re.MULTILINE):
-            shell_match = re.search(r'\.shell\(([^)]+)\)', code)
+        if _TRAILING_SHELL_RE.search(code):
+            shell_match = _SHELL_RE.search(code)
             if shell_match and '.faces(' not in code[:code.find('.shell(')]:
                 warnings.append("shell() without face selection may give unexpected results")
         
@@ -146,8 +150,7 @@ class CodeValidator:
         # Pattern: .cylinder(...) followed by .edges("|Z").fillet(...)
         if '.cylinder(' in code and '.edges("|Z")' in code:
             # Check if fillet/chamfer follows edges("|Z") selection
-            pattern = r'\.edges\("\|Z"\)\s*\.(?:fillet|chamfer)\('
-            if re.search(pattern, code):
+            if _CYLINDER_EDGE_FILLET_RE.search(code):
                 errors.append(
                     "Cannot use .edges(\"|Z\") on cylinders - they have no vertical edges. "
                     "Use .edges(\">Z\") or .edges(\"<Z\") for top/bottom edges instead."
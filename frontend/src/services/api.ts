@@ -117,27 +117,32 @@ export async function deletePart(id: string): Promise<void> {
 
 // Import 3D files
 export async function importFile(projectId: string, file: File): Promise<Part> {
-  const formData = new FormData()
-  formData.append('project_id', projectId)
-  formData.append('file', file)
-  
-  const response = await api.post('/import/file', formData, {
+  // Send the file as the raw request body to skip multipart encoding/parsing
+  const response = await api.post(`/import/file-raw/${projectId}`, file, {
     headers: {
-      'Content-Type': 'multipart/form-data',
+      'Content-Type': 'application/octet-stream',
+      'X-Filename': encodeURIComponent(file.name),
     },
   })
   return response.data
 }
 
 export interface ImportedMesh {
-  vertices: number[][]
-  faces: number[][]
-  source_file: string
+  vertices: Float32Array  // flat x, y, z triplets
+  faces: Uint32Array      // flat vertex index triplets
 }
 
 export async function getImportedMesh(partId: string): Promise<ImportedMesh> {
-  const response = await api.get(`/import/mesh/${partId}`)
-  return response.data
+  const response = await api.get(`/import/mesh/${partId}`, { responseType: 'arraybuffer' })
+  const buffer: ArrayBuffer = response.data
+  // Header: "MESH" magic, vertex count, face count (little-endian uint32)
+  const header = new DataView(buffer, 0, 12)
+  const vertexCount = header.getUint32(4, true)
+  const faceCount = header.getUint32(8, true)
+  return {
+    vertices: new Float32Array(buffer, 12, vertexCount * 3),
+    faces: new Uint32Array(buffer, 12 + vertexCount * 12, faceCount * 3),
+  }
 }
 
 // Versions